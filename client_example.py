@@ -9,14 +9,78 @@ import asyncio
 import json
 import logging
 import sys
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import aiohttp
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+    _json_loads = json.loads
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 可复用的字节缓冲区池，减少长连接上的内存分配
+_BUF_POOL: List[bytearray] = []
+_BUF_POOL_SIZE = 10
+
+# 单批分发的最大事件数
+_EVENT_BATCH_SIZE = 32
+
+
+def _fastdecode(data: bytes) -> str:
+    """解码字节，优先走纯ASCII的快速路径"""
+    try:
+        return data.decode('ascii')
+    except UnicodeDecodeError:
+        return data.decode('utf-8')
+
+
+def _loads_bytes(data: bytes) -> Any:
+    """从字节解析JSON，orjson可直接解析无需先解码"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(_fastdecode(data))
+
+
+def _acquire() -> bytearray:
+    """从缓冲区池取出一个空缓冲区"""
+    if _BUF_POOL:
+        return _BUF_POOL.pop()
+    return bytearray()
+
+
+def _release(buf: bytearray):
+    """清空缓冲区并归还到池中"""
+    del buf[:]
+    if len(_BUF_POOL) < _BUF_POOL_SIZE:
+        _BUF_POOL.append(buf)
+
+
+# 全局共享的HTTP会话（连接池、keep-alive、DNS缓存）
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """获取共享的HTTP会话，首次调用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+
+async def close_session():
+    """关闭共享的HTTP会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
 
 class DocumentConversionClient:
     """MCP客户端示例"""
@@ -77,21 +141,27 @@ class SSEClient:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
         self.session = None
+        # 未消费完的字节缓冲区（增量解析），监听期间从缓冲区池获取
+        self._buf = bytearray()
+        # 复用的事件对象，每个事件解析前原地重置
+        self._event: Dict[str, Any] = {'event': None, 'id': None, 'data': bytearray(), 'has_data': False}
     
     async def connect(self):
         """连接到SSE端点"""
-        self.session = aiohttp.ClientSession()
+        self.session = await get_session()
     
     async def disconnect(self):
-        """断开连接"""
-        if self.session:
-            await self.session.close()
+        """断开连接（共享会话由 close_session 统一关闭）"""
+        self.session = None
     
     async def listen_events(self, duration: int = 60):
         """监听SSE事件"""
         if not self.session:
             await self.connect()
         
+        self._buf = _acquire()
+        self._event['data'] = _acquire()
+        
         try:
             logger.info(f"Connecting to SSE endpoint: {self.base_url}/events")
             
@@ -103,40 +173,117 @@ class SSEClient:
                 logger.info("SSE connection established, listening for events...")
                 
                 start_time = asyncio.get_event_loop().time()
+                batch: List[Dict[str, Any]] = []
                 
-                async for line in response.content:
+                async for chunk in response.content.iter_any():
                     # 检查超时
                     if asyncio.get_event_loop().time() - start_time > duration:
                         logger.info("Listening duration exceeded, stopping...")
                         break
                     
-                    line = line.decode('utf-8').strip()
-                    
-                    if line.startswith('data: '):
-                        try:
-                            data = json.loads(line[6:])
-                            await self._handle_event(data)
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse SSE data: {e}")
-                    elif line.startswith('event: '):
-                        event_type = line[7:]
-                        logger.debug(f"Event type: {event_type}")
-                    elif line.startswith('id: '):
-                        event_id = line[4:]
-                        logger.debug(f"Event ID: {event_id}")
-                    elif line == "":
-                        # 空行表示事件结束
-                        pass
-                    elif line.startswith(': '):
-                        # 注释行（心跳等）
-                        logger.debug(f"SSE comment: {line[2:]}")
+                    batch.extend(self._feed(chunk))
+                    # 攒够一批或缓冲区已消费完时统一分发
+                    if batch and (len(batch) >= _EVENT_BATCH_SIZE or not self._buf):
+                        await self._handle_events_batch(batch)
+                        batch.clear()
+                
+                if batch:
+                    await self._handle_events_batch(batch)
                 
         except Exception as e:
             logger.error(f"SSE client error: {e}")
         finally:
+            _release(self._buf)
+            _release(self._event['data'])
+            self._buf = bytearray()
+            self._event['data'] = bytearray()
             await self.disconnect()
     
-    async def _handle_event(self, data: Dict[str, Any]):
+    def _feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """增量解析字节流，返回已完整接收的事件"""
+        buf = self._buf
+        pending_cr = buf.endswith(b'\r')
+        buf += chunk
+        if pending_cr or b'\r' in chunk:
+            # 统一换行符，\r\n 可能跨越两个分块
+            buf[:] = buf.replace(b'\r\n', b'\n')
+        
+        events = []
+        cursor = 0
+        while True:
+            # 空行表示事件结束
+            end = buf.find(b'\n\n', cursor)
+            if end < 0:
+                break
+            data = self._parse_frame(buf[cursor:end])
+            if data is not None:
+                events.append(data)
+            cursor = end + 2
+        
+        if cursor:
+            del buf[:cursor]
+        return events
+    
+    def _parse_frame(self, frame: bytes) -> Optional[Dict[str, Any]]:
+        """解析单个事件帧，仅在最后对data负载解码"""
+        event = self._event
+        event['event'] = None
+        event['id'] = None
+        event['has_data'] = False
+        del event['data'][:]
+        
+        handlers = self._FIELD_HANDLERS
+        for line in frame.split(b'\n'):
+            # 按行首字节查表分派，空行和未知字段直接跳过
+            entry = handlers.get(line[0]) if line else None
+            if entry is not None and line.startswith(entry[0]):
+                entry[1](self, line[len(entry[0]):])
+        
+        if not event['has_data']:
+            return None
+        
+        try:
+            return _loads_bytes(event['data'])
+        except ValueError as e:
+            logger.warning(f"Failed to parse SSE data: {e}")
+            return None
+    
+    def _on_data(self, value: bytes):
+        """data字段，多行数据以换行拼接"""
+        event = self._event
+        if event['has_data']:
+            event['data'] += b'\n'
+        event['data'] += value.lstrip(b' ')
+        event['has_data'] = True
+    
+    def _on_event_type(self, value: bytes):
+        """event字段"""
+        self._event['event'] = _fastdecode(value.strip())
+        logger.debug(f"Event type: {self._event['event']}")
+    
+    def _on_id(self, value: bytes):
+        """id字段"""
+        self._event['id'] = _fastdecode(value.strip())
+        logger.debug(f"Event ID: {self._event['id']}")
+    
+    def _on_comment(self, value: bytes):
+        """注释行（心跳等）"""
+        logger.debug(f"SSE comment: {value.strip().decode('utf-8', 'replace')}")
+    
+    # 行首字节 -> (字段前缀, 处理函数)
+    _FIELD_HANDLERS = {
+        ord('d'): (b'data:', _on_data),
+        ord('e'): (b'event:', _on_event_type),
+        ord('i'): (b'id:', _on_id),
+        ord(':'): (b':', _on_comment),
+    }
+    
+    async def _handle_events_batch(self, batch: List[Dict[str, Any]]):
+        """批量处理SSE事件"""
+        for data in batch:
+            self._handle_event(data)
+    
+    def _handle_event(self, data: Dict[str, Any]):
         """处理SSE事件"""
         event_type = data.get('type', 'unknown')
         
@@ -172,12 +319,11 @@ class RestApiClient:
     
     async def connect(self):
         """创建HTTP会话"""
-        self.session = aiohttp.ClientSession()
+        self.session = await get_session()
     
     async def disconnect(self):
-        """关闭HTTP会话"""
-        if self.session:
-            await self.session.close()
+        """释放HTTP会话（共享会话由 close_session 统一关闭）"""
+        self.session = None
     
     async def convert_document(self, source_format: str, target_format: str, content: str) -> Dict[str, Any]:
         """转换文档"""
@@ -194,7 +340,7 @@ class RestApiClient:
             logger.info(f"Converting document via REST API: {source_format} -> {target_format}")
             
             async with self.session.post(f"{self.base_url}/convert", json=data) as response:
-                result = await response.json()
+                result = await response.json(loads=_json_loads)
                 
                 if response.status == 200:
                     logger.info("Conversion successful")
@@ -214,7 +360,7 @@ class RestApiClient:
         
         try:
             async with self.session.get(f"{self.base_url}/formats") as response:
-                return await response.json()
+                return await response.json(loads=_json_loads)
         except Exception as e:
             logger.error(f"Failed to get formats: {e}")
             return {"error": str(e)}
@@ -226,7 +372,7 @@ class RestApiClient:
         
         try:
             async with self.session.get(f"{self.base_url}/status/{job_id}") as response:
-                return await response.json()
+                return await response.json(loads=_json_loads)
         except Exception as e:
             logger.error(f"Failed to get status: {e}")
             return {"error": str(e)}
@@ -284,15 +430,18 @@ async def main():
     
     mode = sys.argv[1].lower()
     
-    if mode == "mcp":
-        await demo_mcp_client()
-    elif mode == "sse":
-        await demo_sse_client()
-    elif mode == "api":
-        await demo_rest_api()
-    else:
-        print(f"Unknown mode: {mode}")
-        print("Available modes: mcp, sse, api")
+    try:
+        if mode == "mcp":
+            await demo_mcp_client()
+        elif mode == "sse":
+            await demo_sse_client()
+        elif mode == "api":
+            await demo_rest_api()
+        else:
+            print(f"Unknown mode: {mode}")
+            print("Available modes: mcp, sse, api")
+    finally:
+        await close_session()
 
 
 if __name__ == "__main__":
@@ -5,9 +5,116 @@ Configuration Module
 Provides configuration management for the MCP server.
 """
 
+import functools
 import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+# 支持的文档格式（只读元数据）
+SUPPORTED_FORMATS_META: Dict[str, Dict] = {
+    'txt': {'read': True, 'write': True, 'description': 'Plain text'},
+    'md': {'read': True, 'write': True, 'description': 'Markdown'},
+    'html': {'read': True, 'write': True, 'description': 'HTML'},
+    'pdf': {'read': True, 'write': True, 'description': 'PDF'},
+    'docx': {'read': True, 'write': True, 'description': 'Microsoft Word (DOCX)'},
+    'doc': {'read': True, 'write': False, 'description': 'Microsoft Word (DOC) - Read only'}
+}
+
+# 影响配置的环境变量
+_ENV_KEYS = (
+    "SERVER_NAME", "SERVER_VERSION", "SERVER_DESCRIPTION",
+    "API_HOST", "API_PORT", "API_DEBUG", "API_WORKERS",
+    "API_KEEP_ALIVE_TIMEOUT", "API_BACKLOG",
+    "MAX_FILE_SIZE", "TEMP_DIR", "ALLOWED_EXTENSIONS",
+    "CONVERSION_TIMEOUT", "MAX_CONCURRENT_CONVERSIONS", "CLEANUP_TEMP_FILES",
+    "MCP_WORKERS", "CONVERSION_EXECUTOR",
+    "SSE_HEARTBEAT_INTERVAL", "SSE_CONNECTION_TIMEOUT", "SSE_MAX_CONNECTIONS",
+    "SSE_RETRY_INTERVAL",
+    "LOG_LEVEL", "LOG_FORMAT", "LOG_FILE",
+    "ENABLE_CORS", "CORS_ORIGINS", "MAX_REQUEST_SIZE",
+)
+
+
+def _env_int(env: Mapping[str, Optional[str]], name: str) -> Optional[int]:
+    """读取整数环境变量，未设置时返回None"""
+    value = env[name]
+    return int(value) if value is not None else None
+
+
+def _env_bool(env: Mapping[str, Optional[str]], name: str, default: str) -> bool:
+    """读取布尔环境变量"""
+    value = env[name]
+    return (default if value is None else value).lower() == "true"
+
+
+@functools.lru_cache(maxsize=1)
+def _load_env_overrides(snapshot: Tuple[Tuple[str, Optional[str]], ...]) -> Mapping[str, Any]:
+    """解析环境变量中的配置覆盖项，相同的环境变量快照只解析一次"""
+    env = dict(snapshot)
+    overrides: Dict[str, Any] = {}
+    
+    def set_str(field: str, name: str):
+        if env[name] is not None:
+            overrides[field] = env[name]
+    
+    def set_int(field: str, name: str):
+        value = _env_int(env, name)
+        if value is not None:
+            overrides[field] = value
+    
+    # 服务器配置
+    set_str("server_name", "SERVER_NAME")
+    set_str("server_version", "SERVER_VERSION")
+    set_str("server_description", "SERVER_DESCRIPTION")
+    
+    # API配置
+    set_str("api_host", "API_HOST")
+    set_int("api_port", "API_PORT")
+    set_int("api_workers", "API_WORKERS")
+    set_int("api_keep_alive_timeout", "API_KEEP_ALIVE_TIMEOUT")
+    set_int("api_backlog", "API_BACKLOG")
+    overrides["api_debug"] = _env_bool(env, "API_DEBUG", "false")
+    
+    # 文件处理配置
+    if env["MAX_FILE_SIZE"]:
+        overrides["max_file_size"] = int(env["MAX_FILE_SIZE"]) * 1024 * 1024  # MB to bytes
+    
+    set_str("temp_dir", "TEMP_DIR")
+    
+    if env["ALLOWED_EXTENSIONS"]:
+        overrides["allowed_extensions"] = env["ALLOWED_EXTENSIONS"].split(",")
+    
+    # 文档转换配置
+    set_int("conversion_timeout", "CONVERSION_TIMEOUT")
+    set_int("max_concurrent_conversions", "MAX_CONCURRENT_CONVERSIONS")
+    set_int("conversion_workers", "MCP_WORKERS")
+    set_str("conversion_executor", "CONVERSION_EXECUTOR")
+    overrides["cleanup_temp_files"] = _env_bool(env, "CLEANUP_TEMP_FILES", "true")
+    
+    # SSE配置
+    set_int("sse_heartbeat_interval", "SSE_HEARTBEAT_INTERVAL")
+    set_int("sse_connection_timeout", "SSE_CONNECTION_TIMEOUT")
+    set_int("sse_max_connections", "SSE_MAX_CONNECTIONS")
+    set_int("sse_retry_interval", "SSE_RETRY_INTERVAL")
+    
+    # 日志配置
+    set_str("log_level", "LOG_LEVEL")
+    set_str("log_format", "LOG_FORMAT")
+    overrides["log_file"] = env["LOG_FILE"]
+    
+    # 安全配置
+    overrides["enable_cors"] = _env_bool(env, "ENABLE_CORS", "true")
+    
+    if env["CORS_ORIGINS"]:
+        overrides["cors_origins"] = env["CORS_ORIGINS"].split(",")
+    
+    if env["MAX_REQUEST_SIZE"]:
+        overrides["max_request_size"] = int(env["MAX_REQUEST_SIZE"]) * 1024 * 1024  # MB to bytes
+    
+    return MappingProxyType(overrides)
 
 
 @dataclass
@@ -23,6 +130,9 @@ class Config:
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     api_debug: bool = False
+    api_workers: int = 1  # uvicorn工作进程数，任务状态和SSE连接按进程保存
+    api_keep_alive_timeout: int = 600  # 空闲HTTP连接保持时间（秒）
+    api_backlog: int = 2048  # 监听队列长度
     
     # 文件处理配置
     max_file_size: int = 50 * 1024 * 1024  # 50MB
@@ -32,12 +142,15 @@ class Config:
     # 文档转换配置
     conversion_timeout: int = 300  # 5分钟
     max_concurrent_conversions: int = 10
+    conversion_workers: Optional[int] = None  # 常驻转换工作协程数，未设置时与最大并发转换数相同
+    conversion_executor: str = "thread"  # PDF/DOCX处理的执行器：thread 或 process
     cleanup_temp_files: bool = True
     
     # SSE配置
     sse_heartbeat_interval: int = 30  # 秒
     sse_connection_timeout: int = 3600  # 1小时
     sse_max_connections: int = 100
+    sse_retry_interval: int = 30000  # 建议客户端断线重连的间隔（毫秒）
     
     # 日志配置
     log_level: str = "INFO"
@@ -59,71 +172,40 @@ class Config:
         
         # 从环境变量加载配置
         self._load_from_env()
-    
-    def _load_from_env(self):
-        """从环境变量加载配置"""
-        # 服务器配置
-        self.server_name = os.getenv("SERVER_NAME", self.server_name)
-        self.server_version = os.getenv("SERVER_VERSION", self.server_version)
-        self.server_description = os.getenv("SERVER_DESCRIPTION", self.server_description)
-        
-        # API配置
-        self.api_host = os.getenv("API_HOST", self.api_host)
-        self.api_port = int(os.getenv("API_PORT", str(self.api_port)))
-        self.api_debug = os.getenv("API_DEBUG", "false").lower() == "true"
-        
-        # 文件处理配置
-        if os.getenv("MAX_FILE_SIZE"):
-            self.max_file_size = int(os.getenv("MAX_FILE_SIZE")) * 1024 * 1024  # MB to bytes
-        
-        self.temp_dir = os.getenv("TEMP_DIR", self.temp_dir)
-        
-        if os.getenv("ALLOWED_EXTENSIONS"):
-            self.allowed_extensions = os.getenv("ALLOWED_EXTENSIONS").split(",")
         
-        # 文档转换配置
-        self.conversion_timeout = int(os.getenv("CONVERSION_TIMEOUT", str(self.conversion_timeout)))
-        self.max_concurrent_conversions = int(os.getenv("MAX_CONCURRENT_CONVERSIONS", str(self.max_concurrent_conversions)))
-        self.cleanup_temp_files = os.getenv("CLEANUP_TEMP_FILES", "true").lower() == "true"
+        # 工作协程数决定实际的并发上限，默认跟随最大并发转换数
+        if self.conversion_workers is None:
+            self.conversion_workers = self.max_concurrent_conversions
         
-        # SSE配置
-        self.sse_heartbeat_interval = int(os.getenv("SSE_HEARTBEAT_INTERVAL", str(self.sse_heartbeat_interval)))
-        self.sse_connection_timeout = int(os.getenv("SSE_CONNECTION_TIMEOUT", str(self.sse_connection_timeout)))
-        self.sse_max_connections = int(os.getenv("SSE_MAX_CONNECTIONS", str(self.sse_max_connections)))
+        # 预先计算允许的扩展名集合（小写）
+        self._ext_set = frozenset(ext.lower() for ext in self.allowed_extensions)
         
-        # 日志配置
-        self.log_level = os.getenv("LOG_LEVEL", self.log_level)
-        self.log_format = os.getenv("LOG_FORMAT", self.log_format)
-        self.log_file = os.getenv("LOG_FILE")
-        
-        # 安全配置
-        self.enable_cors = os.getenv("ENABLE_CORS", "true").lower() == "true"
-        
-        if os.getenv("CORS_ORIGINS"):
-            self.cors_origins = os.getenv("CORS_ORIGINS").split(",")
-        
-        if os.getenv("MAX_REQUEST_SIZE"):
-            self.max_request_size = int(os.getenv("MAX_REQUEST_SIZE")) * 1024 * 1024  # MB to bytes
+        # 准备临时目录（只在加载配置时执行一次）
+        self._temp_dir_error: Optional[str] = None
+        try:
+            Path(self.temp_dir).mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            self._temp_dir_error = f"Cannot create temp directory {self.temp_dir}: {e}"
+    
+    def _load_from_env(self):
+        """从环境变量加载配置"""
+        snapshot = tuple((name, os.environ.get(name)) for name in _ENV_KEYS)
+        for field, value in _load_env_overrides(snapshot).items():
+            # 列表值复制一份，避免实例之间共享缓存中的对象
+            setattr(self, field, list(value) if isinstance(value, list) else value)
     
     def get_supported_formats(self) -> Dict[str, Dict[str, bool]]:
         """获取支持的文档格式"""
-        return {
-            'txt': {'read': True, 'write': True, 'description': 'Plain text'},
-            'md': {'read': True, 'write': True, 'description': 'Markdown'},
-            'html': {'read': True, 'write': True, 'description': 'HTML'},
-            'pdf': {'read': True, 'write': True, 'description': 'PDF'},
-            'docx': {'read': True, 'write': True, 'description': 'Microsoft Word (DOCX)'},
-            'doc': {'read': True, 'write': False, 'description': 'Microsoft Word (DOC) - Read only'}
-        }
+        return SUPPORTED_FORMATS_META
     
     def is_file_allowed(self, filename: str) -> bool:
         """检查文件是否允许"""
         if not filename:
             return False
         
-        # 检查扩展名
-        ext = os.path.splitext(filename.lower())[1]
-        return ext in self.allowed_extensions
+        # 检查扩展名，只对扩展名部分转小写
+        i = filename.rfind('.')
+        return i >= 0 and filename[i:].lower() in self._ext_set
     
     def get_temp_path(self, filename: str) -> str:
         """获取临时文件路径"""
@@ -137,13 +219,16 @@ class Config:
         return os.path.join(self.temp_dir, temp_name)
     
     def validate(self) -> List[str]:
-        """验证配置"""
+        """验证配置（不访问文件系统，可频繁调用）"""
         errors = []
         
         # 验证端口
         if not (1 <= self.api_port <= 65535):
             errors.append(f"Invalid API port: {self.api_port}")
         
+        if self.api_workers <= 0:
+            errors.append(f"Invalid API workers: {self.api_workers}")
+        
         # 验证文件大小
         if self.max_file_size <= 0:
             errors.append(f"Invalid max file size: {self.max_file_size}")
@@ -156,6 +241,12 @@ class Config:
         if self.max_concurrent_conversions <= 0:
             errors.append(f"Invalid max concurrent conversions: {self.max_concurrent_conversions}")
         
+        if self.conversion_workers <= 0:
+            errors.append(f"Invalid conversion workers: {self.conversion_workers}")
+        
+        if self.conversion_executor not in ("thread", "process"):
+            errors.append(f"Invalid conversion executor: {self.conversion_executor}")
+        
         # 验证SSE配置
         if self.sse_heartbeat_interval <= 0:
             errors.append(f"Invalid SSE heartbeat interval: {self.sse_heartbeat_interval}")
@@ -163,12 +254,12 @@ class Config:
         if self.sse_connection_timeout <= 0:
             errors.append(f"Invalid SSE connection timeout: {self.sse_connection_timeout}")
         
-        # 验证临时目录
-        if not os.path.exists(self.temp_dir):
-            try:
-                os.makedirs(self.temp_dir, exist_ok=True)
-            except Exception as e:
-                errors.append(f"Cannot create temp directory {self.temp_dir}: {e}")
+        if self.sse_retry_interval <= 0:
+            errors.append(f"Invalid SSE retry interval: {self.sse_retry_interval}")
+        
+        # 验证临时目录（已在初始化时创建）
+        if self._temp_dir_error:
+            errors.append(self._temp_dir_error)
         
         return errors
     
@@ -183,7 +274,10 @@ class Config:
             'api': {
                 'host': self.api_host,
                 'port': self.api_port,
-                'debug': self.api_debug
+                'debug': self.api_debug,
+                'workers': self.api_workers,
+                'keep_alive_timeout': self.api_keep_alive_timeout,
+                'backlog': self.api_backlog
             },
             'file_handling': {
                 'max_file_size': self.max_file_size,
@@ -193,12 +287,15 @@ class Config:
             'conversion': {
                 'timeout': self.conversion_timeout,
                 'max_concurrent': self.max_concurrent_conversions,
+                'workers': self.conversion_workers,
+                'executor': self.conversion_executor,
                 'cleanup_temp_files': self.cleanup_temp_files
             },
             'sse': {
                 'heartbeat_interval': self.sse_heartbeat_interval,
                 'connection_timeout': self.sse_connection_timeout,
-                'max_connections': self.sse_max_connections
+                'max_connections': self.sse_max_connections,
+                'retry_interval': self.sse_retry_interval
             },
             'logging': {
                 'level': self.log_level,
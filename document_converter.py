@@ -6,25 +6,276 @@ Provides asynchronous document conversion capabilities between various formats.
 """
 
 import asyncio
+import hashlib
+import html
 import logging
 import os
-import tempfile
+import re
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
 import aiofiles
+import aiofiles.tempfile
 import markdown
+from cachetools import TTLCache
 from docx import Document
-from PyPDF2 import PdfReader
+from pypdf import PdfReader
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # 未安装selectolax时使用正则实现
+    LexborHTMLParser = None
+
+from config import config
+
 logger = logging.getLogger(__name__)
 
+# 预编译的HTML处理正则
+_RE_BR = re.compile(r'<br\s*/?>\n?')  # 连同标签后的换行一起替换
+_RE_TAG = re.compile(r'<[^>]+>')
+_RE_SPACE = re.compile(r'\s+')
+_RE_H1 = re.compile(r'<h1[^>]*>(.*?)</h1>', re.DOTALL)
+_RE_H2 = re.compile(r'<h2[^>]*>(.*?)</h2>', re.DOTALL)
+_RE_H3 = re.compile(r'<h3[^>]*>(.*?)</h3>', re.DOTALL)
+_RE_STRONG = re.compile(r'<strong[^>]*>(.*?)</strong>', re.DOTALL)
+_RE_EM = re.compile(r'<em[^>]*>(.*?)</em>', re.DOTALL)
+
+# 各格式对应的内容类型
+_CONTENT_TYPES = {
+    'txt': 'text/plain',
+    'md': 'text/markdown',
+    'html': 'text/html',
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+# 任务表最多保留的任务数
+_MAX_JOBS = 10_000
+
+# 文本格式的转换结果缓存条目数
+_RESULT_CACHE_SIZE = 256
+_TEXT_FORMATS = frozenset({'txt', 'md', 'html'})
+
+# DOM遍历时需要换行的块级元素
+_BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt',
+    'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'
+})
+_SKIP_TAGS = frozenset({'script', 'style', 'template'})
+# 中间HTML由纯文本逐行生成的源格式
+_PLAIN_TEXT_SOURCES = frozenset({'txt', 'pdf', 'docx'})
+_MD_BLOCK_PREFIX = {
+    'h1': '# ', 'h2': '## ', 'h3': '### ',
+    'h4': '#### ', 'h5': '##### ', 'h6': '###### ',
+    'li': '- '
+}
+_MD_INLINE_MARKER = {'strong': '**', 'b': '**', 'em': '*', 'i': '*'}
+
+
+def _render_dom_lines(
+    content: str,
+    as_markdown: bool = False,
+    preserve_whitespace: bool = False
+) -> List[str]:
+    """遍历HTML DOM生成文本行，as_markdown=True 时输出Markdown标记
+    
+    <pre> 和 <code> 中的文本按原有换行拆分并保留空白；preserve_whitespace=True
+    用于由纯文本生成的中间HTML，保留全部空白，只去掉 <br> 后附带的换行
+    """
+    lines: List[str] = []
+    # 当前行的片段：(文本, 是否原样保留)
+    current: List[tuple] = []
+    
+    def add(text: str, verbatim: bool = False):
+        if preserve_whitespace and not verbatim:
+            text = text.replace('\r', '').replace('\n', '')
+            verbatim = True
+        current.append((text, verbatim))
+    
+    def add_verbatim_lines(text: str):
+        # 按换行拆分为多行，每行内容原样保留
+        first, *rest = text.split('\n')
+        add(first, verbatim=True)
+        for part in rest:
+            flush(force=True)
+            add(part, verbatim=True)
+    
+    def flush(force: bool = False):
+        # 与浏览器一致，合并可折叠片段中的连续空白
+        line = ''
+        trailing_space = False
+        for text, verbatim in current:
+            if verbatim:
+                line += text
+                trailing_space = False
+                continue
+            text = _RE_SPACE.sub(' ', text)
+            if text.startswith(' ') and (not line or line.endswith(' ')):
+                text = text[1:]
+            if text:
+                line += text
+                trailing_space = text.endswith(' ')
+        if trailing_space:
+            line = line[:-1]
+        current.clear()
+        if line or force:
+            lines.append(line)
+    
+    def walk(node):
+        for child in node.iter(include_text=True):
+            tag = child.tag
+            if tag == '-text':
+                add(child.text_content)
+            elif tag == 'br':
+                flush(force=True)
+            elif tag == 'pre':
+                flush()
+                if as_markdown:
+                    lines.append('```')
+                add_verbatim_lines(child.text(deep=True).rstrip('\n'))
+                flush(force=True)
+                if as_markdown:
+                    lines.append('```')
+                    lines.append('')
+            elif tag == 'code':
+                marker = '`' if as_markdown and '\n' not in child.text(deep=True) else ''
+                add(marker, verbatim=True)
+                add_verbatim_lines(child.text(deep=True))
+                add(marker, verbatim=True)
+            elif tag in _BLOCK_TAGS:
+                flush()
+                if as_markdown and tag in _MD_BLOCK_PREFIX:
+                    add(_MD_BLOCK_PREFIX[tag], verbatim=True)
+                walk(child)
+                flush()
+                # Markdown中块级元素之间用空行分隔
+                if as_markdown and tag != 'li' and lines and lines[-1]:
+                    lines.append('')
+            elif as_markdown and tag in _MD_INLINE_MARKER:
+                marker = _MD_INLINE_MARKER[tag]
+                add(marker, verbatim=True)
+                walk(child)
+                add(marker, verbatim=True)
+            elif tag not in _SKIP_TAGS:
+                walk(child)
+    
+    tree = LexborHTMLParser(content)
+    if tree.body is not None:
+        walk(tree.body)
+    flush()
+    return lines
+
+
+def _html_to_lines(content: str, preserve_whitespace: bool = False) -> List[str]:
+    """HTML转为纯文本行（已解码HTML实体）"""
+    if LexborHTMLParser is not None:
+        return _render_dom_lines(content, preserve_whitespace=preserve_whitespace)
+    text = _RE_BR.sub('\n', content)
+    text = _RE_TAG.sub('', text)
+    return html.unescape(text).split('\n')
+
+
+def _read_pdf_sync(file_path: str) -> str:
+    """读取PDF文本（在执行器中运行）"""
+    with open(file_path, 'rb') as file:
+        reader = PdfReader(file)
+        parts = [page.extract_text() or "" for page in reader.pages]
+    return "\n".join(parts)
+
+
+def _read_docx_sync(file_path: str) -> str:
+    """读取DOCX文本（在执行器中运行）"""
+    doc = Document(file_path)
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def _create_pdf_sync(html_content: str, preserve_whitespace: bool = False) -> bytes:
+    """生成PDF（在执行器中运行）"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+    
+    for line in _html_to_lines(html_content, preserve_whitespace):
+        if line.strip():
+            # Paragraph会解析标记，需转义纯文本
+            p = Paragraph(html.escape(line, quote=False), styles['Normal'])
+            story.append(p)
+            story.append(Spacer(1, 0.2*inch))
+    
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _create_docx_sync(html_content: str, preserve_whitespace: bool = False) -> bytes:
+    """生成DOCX（在执行器中运行）"""
+    doc = Document()
+    
+    for line in _html_to_lines(html_content, preserve_whitespace):
+        if line.strip():
+            doc.add_paragraph(line)
+    
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _content_key(source_format: str, target_format: str, content: str) -> tuple:
+    """按源格式、目标格式和内容摘要生成缓存键"""
+    digest = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+    return (source_format, target_format, digest)
+
+
+def _remove_result_file(job: Dict[str, Any]):
+    """删除任务结果对应的临时文件"""
+    result = job.get('result')
+    if result and result.get('file_path'):
+        try:
+            os.unlink(result['file_path'])
+        except OSError:
+            pass
+
+
+class _Job(dict):
+    """任务状态字典，每次修改字段时递增 version，便于调用方缓存状态输出"""
+    __slots__ = ('version',)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+
+class _JobCache(TTLCache):
+    """任务状态表，过期或超出容量被淘汰的任务会清理其临时文件"""
+    
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if config.cleanup_temp_files:
+            for _, job in expired:
+                _remove_result_file(job)
+        return expired
+    
+    def popitem(self):
+        key, job = super().popitem()
+        if config.cleanup_temp_files:
+            _remove_result_file(job)
+        return key, job
+
 
 class DocumentConverter:
     """文档转换器类"""
@@ -38,7 +289,31 @@ class DocumentConverter:
             'docx': {'read': True, 'write': True},
             'doc': {'read': True, 'write': False}  # 只读
         }
-        self.jobs = {}  # 存储转换任务状态
+        # 存储转换任务状态，完成或遗弃的任务超时后自动淘汰
+        self.jobs = _JobCache(maxsize=_MAX_JOBS, ttl=config.conversion_timeout * 2)
+        # 文本转换结果的LRU缓存，键见 _content_key
+        self._result_cache: OrderedDict = OrderedDict()
+        # 正在执行的转换任务，键同上，值为任务ID
+        self._inflight: Dict[tuple, str] = {}
+        # 限制同时执行的转换任务数
+        self._sem = asyncio.Semaphore(config.max_concurrent_conversions)
+        # 待执行的转换任务队列，由常驻工作协程消费（首次提交任务时启动）
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._worker_loop: Optional[asyncio.AbstractEventLoop] = None  # 工作协程所在的事件循环
+        # 专用线程池，避免与进程内其他阻塞任务共享默认执行器
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.max_concurrent_conversions,
+            thread_name_prefix="docconv"
+        )
+        # 读取和生成PDF/DOCX等CPU密集的工作所用的执行器
+        # 配置为process时使用进程池，避免受GIL限制
+        if config.conversion_executor == 'process':
+            self._cpu_executor: Executor = ProcessPoolExecutor(
+                max_workers=min(config.max_concurrent_conversions, os.cpu_count() or 1)
+            )
+        else:
+            self._cpu_executor = self._executor
         
     def get_supported_formats(self) -> List[str]:
         """获取支持的格式列表"""
@@ -52,36 +327,176 @@ class DocumentConverter:
         file_path: Optional[str] = None
     ) -> str:
         """异步文档转换"""
+        job_id = self.allocate_job(source_format, target_format, content, file_path)
+        await self.run_job(job_id)
+        return job_id
+    
+    def allocate_job(
+        self,
+        source_format: str,
+        target_format: str,
+        content: Optional[str] = None,
+        file_path: Optional[str] = None
+    ) -> str:
+        """创建转换任务并返回任务ID，需调用 run_job 提交执行
+        
+        可直接得到结果的任务（同格式文本、命中缓存）会立即标记为完成，
+        相同请求正在转换时返回已有的任务ID
+        """
+        cache_key = None
+        if content and not file_path:
+            cache_key = _content_key(source_format, target_format, content)
+            # 相同请求正在转换时复用同一个任务
+            inflight_id = self._inflight.get(cache_key)
+            if inflight_id is not None and inflight_id in self.jobs:
+                return inflight_id
+        
         job_id = str(uuid.uuid4())
         
         # 初始化任务状态
-        self.jobs[job_id] = {
+        job = _Job({
             'status': 'pending',
             'progress': 0,
             'source_format': source_format,
             'target_format': target_format,
-            'created_at': datetime.now(),
+            'created_at': time.time(),  # 仅在对外输出时格式化
             'error': None,
-            'result': None
-        }
+            'result': None,
+            '_done': asyncio.Event()  # 任务结束（成功或失败）时置位
+        })
+        self.jobs[job_id] = job
         
-        # 启动异步转换任务
-        asyncio.create_task(self._convert_task(job_id, source_format, target_format, content, file_path))
+        if cache_key is not None:
+            # 同格式的文本转换无需执行转换流程
+            if source_format == target_format and target_format in _TEXT_FORMATS:
+                self._complete_job(job, {
+                    'success': True,
+                    'content': content,
+                    'content_type': self._get_content_type(target_format)
+                })
+                return job_id
+            
+            # 相同内容的重复转换直接返回缓存结果
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                self._result_cache.move_to_end(cache_key)
+                self._complete_job(job, dict(cached))
+                return job_id
+            
+            self._inflight[cache_key] = job_id
         
+        # 待提交的转换参数，由 run_job 取出
+        job['_task'] = (source_format, target_format, content, file_path, cache_key)
         return job_id
     
+    async def run_job(self, job_id: str):
+        """将 allocate_job 创建的任务提交到任务队列，已提交或已完成的任务忽略"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        task = job.pop('_task', None)
+        if task is None:
+            return
+        
+        # 提交到任务队列，由工作协程执行转换
+        self._ensure_workers().put_nowait((job_id, job, *task))
+    
+    def _ensure_workers(self) -> asyncio.Queue:
+        """启动常驻的转换工作协程，返回任务队列
+        
+        队列和工作协程绑定在创建它们的事件循环上，事件循环变化或工作协程全部退出时重新创建
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._queue is None
+            or loop is not self._worker_loop
+            or all(worker.done() for worker in self._workers)
+        ):
+            if self._worker_loop is not None and not self._worker_loop.is_closed():
+                for worker in self._workers:
+                    worker.cancel()
+            self._queue = asyncio.Queue()
+            # 信号量同样绑定事件循环，随队列一起重建
+            self._sem = asyncio.Semaphore(config.max_concurrent_conversions)
+            self._worker_loop = loop
+            self._workers = [
+                loop.create_task(self._worker(self._queue), name=f"docconv-worker-{i}")
+                for i in range(config.conversion_workers)
+            ]
+        return self._queue
+    
+    async def _worker(self, queue: asyncio.Queue):
+        """从队列中取出任务并执行转换"""
+        while True:
+            item = await queue.get()
+            try:
+                await self._convert_task(*item)
+            except Exception as e:
+                logger.error(f"Conversion worker error for job {item[0]}: {e}")
+            finally:
+                queue.task_done()
+    
+    def _complete_job(self, job: Dict[str, Any], result: Dict[str, Any]):
+        """将任务直接标记为完成"""
+        job['result'] = result
+        job['status'] = 'completed'
+        job['progress'] = 100
+        job['_done'].set()
+    
+    def _cache_result(self, cache_key: tuple, result: Dict[str, Any]):
+        """缓存文本转换结果"""
+        self._result_cache[cache_key] = result
+        self._result_cache.move_to_end(cache_key)
+        if len(self._result_cache) > _RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+    
+    async def convert_many_async(self, items: List[Dict[str, Any]]) -> List[str]:
+        """批量提交转换任务，返回任务ID列表
+        
+        每个元素包含 convert_async 的参数：source_format、target_format、content、file_path
+        """
+        return [await self.convert_async(**item) for item in items]
+    
+    async def gather_results(self, job_ids: List[str], timeout: int = 300) -> List[Dict[str, Any]]:
+        """并发等待多个任务完成"""
+        return await asyncio.gather(
+            *(self.wait_for_completion(job_id, timeout) for job_id in job_ids)
+        )
+    
     async def _convert_task(
         self,
         job_id: str,
+        job: Dict[str, Any],
         source_format: str,
         target_format: str,
         content: Optional[str] = None,
-        file_path: Optional[str] = None
+        file_path: Optional[str] = None,
+        cache_key: Optional[tuple] = None
     ):
         """执行转换任务"""
+        # 直接持有任务字典，即使任务已从任务表中淘汰也能正常更新
+        try:
+            async with self._sem:
+                await self._run_conversion(job_id, job, source_format, target_format, content, file_path, cache_key)
+        finally:
+            if cache_key is not None and self._inflight.get(cache_key) == job_id:
+                del self._inflight[cache_key]
+            job['_done'].set()
+    
+    async def _run_conversion(
+        self,
+        job_id: str,
+        job: Dict[str, Any],
+        source_format: str,
+        target_format: str,
+        content: Optional[str] = None,
+        file_path: Optional[str] = None,
+        cache_key: Optional[tuple] = None
+    ):
+        """转换任务主体"""
         try:
-            self.jobs[job_id]['status'] = 'running'
-            self.jobs[job_id]['progress'] = 10
+            job['status'] = 'running'
+            job['progress'] = 10
             
             # 验证格式支持
             if source_format not in self.supported_formats:
@@ -91,7 +506,7 @@ class DocumentConverter:
             if not self.supported_formats[target_format]['write']:
                 raise ValueError(f"Cannot write to format: {target_format}")
             
-            self.jobs[job_id]['progress'] = 30
+            job['progress'] = 30
             
             # 读取源文档
             if file_path:
@@ -102,37 +517,39 @@ class DocumentConverter:
             if not source_content:
                 raise ValueError("No content to convert")
             
-            self.jobs[job_id]['progress'] = 60
+            job['progress'] = 60
             
             # 执行转换
             result = await self._convert_content(source_content, source_format, target_format)
             
-            self.jobs[job_id]['progress'] = 90
+            job['progress'] = 90
             
             # 保存结果
             if target_format in ['pdf', 'docx']:
                 # 二进制格式需要保存到文件
                 output_path = await self._save_binary_result(result, target_format)
-                self.jobs[job_id]['result'] = {
+                job['result'] = {
                     'success': True,
                     'file_path': output_path,
                     'content_type': self._get_content_type(target_format)
                 }
             else:
                 # 文本格式直接返回内容
-                self.jobs[job_id]['result'] = {
+                job['result'] = {
                     'success': True,
                     'content': result,
                     'content_type': self._get_content_type(target_format)
                 }
+                if cache_key is not None:
+                    self._cache_result(cache_key, dict(job['result']))
             
-            self.jobs[job_id]['status'] = 'completed'
-            self.jobs[job_id]['progress'] = 100
+            job['status'] = 'completed'
+            job['progress'] = 100
             
         except Exception as e:
             logger.error(f"Conversion error for job {job_id}: {e}")
-            self.jobs[job_id]['status'] = 'failed'
-            self.jobs[job_id]['error'] = str(e)
+            job['status'] = 'failed'
+            job['error'] = str(e)
     
     async def _read_file(self, file_path: str, format: str) -> str:
         """读取文件内容"""
@@ -148,28 +565,13 @@ class DocumentConverter:
     
     async def _read_pdf(self, file_path: str) -> str:
         """读取PDF文件"""
-        def _read_pdf_sync():
-            with open(file_path, 'rb') as file:
-                reader = PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _read_pdf_sync)
+        return await loop.run_in_executor(self._cpu_executor, _read_pdf_sync, file_path)
     
     async def _read_docx(self, file_path: str) -> str:
         """读取DOCX文件"""
-        def _read_docx_sync():
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _read_docx_sync)
+        return await loop.run_in_executor(self._cpu_executor, _read_docx_sync, file_path)
     
     async def _convert_content(self, content: str, source_format: str, target_format: str) -> Union[str, bytes]:
         """转换文档内容"""
@@ -179,165 +581,146 @@ class DocumentConverter:
         # 转换为中间格式（纯文本或HTML）
         intermediate_content = await self._to_intermediate(content, source_format)
         
-        # 从中间格式转换为目标格式
-        return await self._from_intermediate(intermediate_content, target_format)
+        # 从中间格式转换为目标格式，纯文本来源的中间HTML需保留原有空白
+        return await self._from_intermediate(
+            intermediate_content, target_format, source_format in _PLAIN_TEXT_SOURCES
+        )
     
     async def _to_intermediate(self, content: str, source_format: str) -> str:
         """转换为中间格式（HTML）"""
         if source_format == 'txt':
-            # 纯文本转HTML，保留换行
-            return content.replace('\n', '<br>\n')
+            # 纯文本转HTML，转义标记字符并保留换行
+            return html.escape(content, quote=False).replace('\n', '<br>\n')
         elif source_format == 'md':
             # Markdown转HTML
             return markdown.markdown(content)
         elif source_format == 'html':
             return content
         elif source_format in ['pdf', 'docx']:
-            # 已经是纯文本，转换为HTML
-            return content.replace('\n', '<br>\n')
+            # 已经是纯文本，转义后转换为HTML
+            return html.escape(content, quote=False).replace('\n', '<br>\n')
         else:
             return content
     
-    async def _from_intermediate(self, content: str, target_format: str) -> Union[str, bytes]:
+    async def _from_intermediate(
+        self,
+        content: str,
+        target_format: str,
+        preserve_whitespace: bool = False
+    ) -> Union[str, bytes]:
         """从中间格式转换为目标格式"""
         if target_format == 'txt':
             # HTML转纯文本
-            import re
-            # 简单的HTML标签移除
-            text = re.sub(r'<br\s*/?>', '\n', content)
-            text = re.sub(r'<[^>]+>', '', text)
-            return text.strip()
+            return '\n'.join(_html_to_lines(content, preserve_whitespace)).strip()
         elif target_format == 'md':
-            # HTML转Markdown（简化版）
-            import re
+            # HTML转Markdown
+            if LexborHTMLParser is not None:
+                return '\n'.join(
+                    _render_dom_lines(content, as_markdown=True, preserve_whitespace=preserve_whitespace)
+                ).strip()
+            # 未安装selectolax时使用简化的正则实现
             text = content
-            text = re.sub(r'<h1[^>]*>(.*?)</h1>', r'# \1', text)
-            text = re.sub(r'<h2[^>]*>(.*?)</h2>', r'## \1', text)
-            text = re.sub(r'<h3[^>]*>(.*?)</h3>', r'### \1', text)
-            text = re.sub(r'<strong[^>]*>(.*?)</strong>', r'**\1**', text)
-            text = re.sub(r'<em[^>]*>(.*?)</em>', r'*\1*', text)
-            text = re.sub(r'<br\s*/?>', '\n', text)
-            text = re.sub(r'<[^>]+>', '', text)
-            return text.strip()
+            text = _RE_H1.sub(r'# \1', text)
+            text = _RE_H2.sub(r'## \1', text)
+            text = _RE_H3.sub(r'### \1', text)
+            text = _RE_STRONG.sub(r'**\1**', text)
+            text = _RE_EM.sub(r'*\1*', text)
+            text = _RE_BR.sub('\n', text)
+            text = _RE_TAG.sub('', text)
+            return html.unescape(text).strip()
         elif target_format == 'html':
             return content
         elif target_format == 'pdf':
-            return await self._create_pdf(content)
+            return await self._create_pdf(content, preserve_whitespace)
         elif target_format == 'docx':
-            return await self._create_docx(content)
+            return await self._create_docx(content, preserve_whitespace)
         else:
             return content
     
-    async def _create_pdf(self, html_content: str) -> bytes:
+    async def _create_pdf(self, html_content: str, preserve_whitespace: bool = False) -> bytes:
         """创建PDF文件"""
-        def _create_pdf_sync():
-            from io import BytesIO
-            import re
-            
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # 简单的HTML解析和转换
-            text = re.sub(r'<br\s*/?>', '\n', html_content)
-            text = re.sub(r'<[^>]+>', '', text)
-            
-            for line in text.split('\n'):
-                if line.strip():
-                    p = Paragraph(line, styles['Normal'])
-                    story.append(p)
-                    story.append(Spacer(1, 0.2*inch))
-            
-            doc.build(story)
-            buffer.seek(0)
-            return buffer.getvalue()
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _create_pdf_sync)
+        return await loop.run_in_executor(
+            self._cpu_executor, _create_pdf_sync, html_content, preserve_whitespace
+        )
     
-    async def _create_docx(self, html_content: str) -> bytes:
+    async def _create_docx(self, html_content: str, preserve_whitespace: bool = False) -> bytes:
         """创建DOCX文件"""
-        def _create_docx_sync():
-            from io import BytesIO
-            import re
-            
-            doc = Document()
-            
-            # 简单的HTML解析和转换
-            text = re.sub(r'<br\s*/?>', '\n', html_content)
-            text = re.sub(r'<[^>]+>', '', text)
-            
-            for line in text.split('\n'):
-                if line.strip():
-                    doc.add_paragraph(line)
-            
-            buffer = BytesIO()
-            doc.save(buffer)
-            buffer.seek(0)
-            return buffer.getvalue()
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _create_docx_sync)
+        return await loop.run_in_executor(
+            self._cpu_executor, _create_docx_sync, html_content, preserve_whitespace
+        )
     
     async def _save_binary_result(self, data: bytes, format: str) -> str:
         """保存二进制结果到临时文件"""
         suffix = f'.{format}'
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            tmp_file.write(data)
+        async with aiofiles.tempfile.NamedTemporaryFile(
+            'wb', delete=False, suffix=suffix, dir=config.temp_dir
+        ) as tmp_file:
+            await tmp_file.write(data)
             return tmp_file.name
     
     def _get_content_type(self, format: str) -> str:
         """获取内容类型"""
-        content_types = {
-            'txt': 'text/plain',
-            'md': 'text/markdown',
-            'html': 'text/html',
-            'pdf': 'application/pdf',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        }
-        return content_types.get(format, 'application/octet-stream')
+        return _CONTENT_TYPES.get(format, 'application/octet-stream')
     
-    async def get_job_status(self, job_id: str) -> Dict[str, Any]:
-        """获取任务状态"""
-        if job_id not in self.jobs:
+    def get_job_version(self, job_id: str) -> Optional[int]:
+        """获取任务状态版本号，任务状态变化时递增；任务不存在时返回None"""
+        job = self.jobs.get(job_id)
+        return None if job is None else job.version
+    
+    async def get_job_status(self, job_id: str, include_result: bool = False) -> Dict[str, Any]:
+        """获取任务状态
+        
+        默认只返回状态摘要，转换结果（可能很大）需通过 include_result=True 获取
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
             return {'error': 'Job not found'}
         
-        job = self.jobs[job_id].copy()
-        if 'created_at' in job:
-            job['created_at'] = job['created_at'].isoformat()
+        # 只返回公开字段，内部字段（以下划线开头）不对外暴露
+        status = {
+            'status': job['status'],
+            'progress': job['progress'],
+            'source_format': job['source_format'],
+            'target_format': job['target_format'],
+            'created_at': datetime.fromtimestamp(job['created_at']).isoformat(),
+            'error': job['error']
+        }
+        if include_result:
+            status['result'] = job['result']
         
-        return job
+        return status
     
     async def wait_for_completion(self, job_id: str, timeout: int = 300) -> Dict[str, Any]:
         """等待任务完成"""
-        start_time = asyncio.get_event_loop().time()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {'success': False, 'error': 'Job not found'}
         
-        while True:
-            if job_id not in self.jobs:
-                return {'success': False, 'error': 'Job not found'}
-            
-            job = self.jobs[job_id]
-            
-            if job['status'] == 'completed':
-                return job['result']
-            elif job['status'] == 'failed':
-                return {'success': False, 'error': job['error']}
-            
-            # 检查超时
-            if asyncio.get_event_loop().time() - start_time > timeout:
-                return {'success': False, 'error': 'Conversion timeout'}
-            
-            await asyncio.sleep(0.5)
+        try:
+            await asyncio.wait_for(job['_done'].wait(), timeout)
+        except asyncio.TimeoutError:
+            return {'success': False, 'error': 'Conversion timeout'}
+        
+        if job['status'] == 'completed':
+            return job['result']
+        return {'success': False, 'error': job['error']}
     
     def cleanup_job(self, job_id: str):
         """清理任务数据"""
-        if job_id in self.jobs:
-            job = self.jobs[job_id]
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
             # 清理临时文件
-            if job.get('result') and job['result'].get('file_path'):
-                try:
-                    os.unlink(job['result']['file_path'])
-                except OSError:
-                    pass
-            del self.jobs[job_id]
\ No newline at end of file
+            _remove_result_file(job)
+    
+    def close(self):
+        """停止工作协程并关闭转换执行器"""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._queue = None
+        self._worker_loop = None
+        self._executor.shutdown(wait=False)
+        if self._cpu_executor is not self._executor:
+            self._cpu_executor.shutdown(wait=False)
\ No newline at end of file
@@ -6,46 +6,72 @@ A Model Context Protocol (MCP) server that provides document conversion capabili
 with Server-Sent Events (SSE) support for real-time communication.
 """
 
-import asyncio
 import json
 import logging
-import mimetypes
 import os
+import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Optional, Union
 
 import aiofiles
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
-from mcp.server import Server
-from mcp.types import (
-    CallToolResult,
-    TextContent,
-    Tool,
-)
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from sse_starlette import EventSourceResponse
 
-from document_converter import DocumentConverter
-from sse_manager import SSEManager
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
+try:
+    # 基于caio的内核异步文件I/O（io_uring/linux aio），未安装时使用aiofiles
+    from aiofile import AIOFile, Writer
+except ImportError:
+    AIOFile = None
+
+from config import config
+from mcp_core import (
+    build_server,
+    document_converter,
+    install_eager_task_factory,
+    run_stdio,
+    sse_manager,
+)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """应用启动时的事件循环设置"""
+    install_eager_task_factory()
+    yield
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title="Document Conversion MCP Server",
     description="MCP server for document conversion with SSE support",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=_lifespan
 )
 
-# 初始化组件
-document_converter = DocumentConverter()
-sse_manager = SSEManager()
+# 上传文件分块读取的大小
+_UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+
+# SSE响应头
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
 
-# MCP服务器实例
-mcp_server = Server("document-conversion-server")
+# /formats 响应体，进程内不变，首次请求时生成
+_FORMATS_BODY: Optional[bytes] = None
+
+# MCP服务器实例（工具定义与处理逻辑见 mcp_core）
+mcp_server = build_server(use_call_tool_result=True)
 
 
 class ConversionRequest(BaseModel):
@@ -64,156 +90,19 @@ class ConversionResponse(BaseModel):
     error: Optional[str] = None
 
 
-@mcp_server.list_tools()
-async def handle_list_tools() -> List[Tool]:
-    """列出可用的工具"""
-    return [
-        Tool(
-            name="convert_document",
-            description="Convert documents between different formats (PDF, DOCX, MD, TXT, HTML)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "source_format": {
-                        "type": "string",
-                        "description": "Source document format (pdf, docx, md, txt, html)"
-                    },
-                    "target_format": {
-                        "type": "string",
-                        "description": "Target document format (pdf, docx, md, txt, html)"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "Document content (for text-based formats)"
-                    },
-                    "file_path": {
-                        "type": "string",
-                        "description": "Path to source file (alternative to content)"
-                    }
-                },
-                "required": ["source_format", "target_format"]
-            }
-        ),
-        Tool(
-            name="list_supported_formats",
-            description="List all supported document formats for conversion",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        Tool(
-            name="get_conversion_status",
-            description="Get the status of a document conversion job",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "job_id": {
-                        "type": "string",
-                        "description": "Conversion job ID"
-                    }
-                },
-                "required": ["job_id"]
-            }
-        )
-    ]
-
-
-@mcp_server.call_tool()
-async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResult:
-    """处理工具调用"""
-    try:
-        if name == "convert_document":
-            return await handle_convert_document(arguments)
-        elif name == "list_supported_formats":
-            return await handle_list_supported_formats()
-        elif name == "get_conversion_status":
-            return await handle_get_conversion_status(arguments)
-        else:
-            raise ValueError(f"Unknown tool: {name}")
-    except Exception as e:
-        logger.error(f"Error handling tool call {name}: {e}")
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=f"Error: {str(e)}"
-                )
-            ],
-            isError=True
-        )
-
-
-async def handle_convert_document(arguments: Dict[str, Any]) -> CallToolResult:
-    """处理文档转换"""
-    source_format = arguments.get("source_format")
-    target_format = arguments.get("target_format")
-    content = arguments.get("content")
-    file_path = arguments.get("file_path")
-    
-    if not source_format or not target_format:
-        raise ValueError("source_format and target_format are required")
-    
-    if not content and not file_path:
-        raise ValueError("Either content or file_path must be provided")
-    
-    # 创建转换任务
-    job_id = await document_converter.convert_async(
-        source_format=source_format,
-        target_format=target_format,
-        content=content,
-        file_path=file_path
-    )
-    
-    # 通过SSE发送进度更新
-    await sse_manager.send_event({
-        "type": "conversion_started",
-        "job_id": job_id,
-        "source_format": source_format,
-        "target_format": target_format
-    })
-    
-    return CallToolResult(
-        content=[
-            TextContent(
-                type="text",
-                text=f"Document conversion started. Job ID: {job_id}"
-            )
-        ],
-        isError=False
-    )
-
-
-async def handle_list_supported_formats() -> CallToolResult:
-    """列出支持的格式"""
-    formats = document_converter.get_supported_formats()
-    return CallToolResult(
-        content=[
-            TextContent(
-                type="text",
-                text=f"Supported formats: {', '.join(formats)}"
-            )
-        ],
-        isError=False
-    )
-
-
-async def handle_get_conversion_status(arguments: Dict[str, Any]) -> CallToolResult:
-    """获取转换状态"""
-    job_id = arguments.get("job_id")
-    if not job_id:
-        raise ValueError("job_id is required")
+async def _save_upload(file: UploadFile, fd: int, temp_path: str):
+    """将上传文件分块写入已创建的临时文件"""
+    if AIOFile is not None:
+        os.close(fd)
+        async with AIOFile(temp_path, 'wb') as afp:
+            writer = Writer(afp)
+            while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+                await writer(chunk)
+        return
     
-    status = await document_converter.get_job_status(job_id)
-    return CallToolResult(
-        content=[
-            TextContent(
-                type="text",
-                text=json.dumps(status, indent=2)
-            )
-        ],
-        isError=False
-    )
+    async with aiofiles.open(fd, 'wb') as f:
+        while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
 
 
 # FastAPI路由
@@ -227,11 +116,12 @@ async def convert_document_api(
     """REST API端点用于文档转换"""
     try:
         if file:
-            # 保存上传的文件
-            temp_path = f"/tmp/{file.filename}"
-            async with aiofiles.open(temp_path, 'wb') as f:
-                content_bytes = await file.read()
-                await f.write(content_bytes)
+            # 分块保存上传的文件，使用唯一的临时文件名避免冲突
+            fd, temp_path = tempfile.mkstemp(
+                suffix=Path(file.filename or "").suffix,
+                dir=config.temp_dir
+            )
+            await _save_upload(file, fd, temp_path)
             
             job_id = await document_converter.convert_async(
                 source_format=source_format,
@@ -266,32 +156,31 @@ async def convert_document_api(
 @app.get("/events")
 async def stream_events():
     """SSE端点用于实时事件流"""
-    return EventSourceResponse(sse_manager.event_stream())
+    # 事件流已是编码好的SSE帧，直接写出；禁止反向代理缓冲
+    return StreamingResponse(
+        sse_manager.event_stream(),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS
+    )
 
 
 @app.get("/formats")
 async def list_formats():
     """列出支持的格式"""
-    return {"formats": document_converter.get_supported_formats()}
+    global _FORMATS_BODY
+    if _FORMATS_BODY is None:
+        body = {"formats": document_converter.get_supported_formats()}
+        if orjson is not None:
+            _FORMATS_BODY = orjson.dumps(body)
+        else:
+            _FORMATS_BODY = json.dumps(body, separators=(",", ":")).encode()
+    return Response(content=_FORMATS_BODY, media_type="application/json")
 
 
 @app.get("/status/{job_id}")
-async def get_status(job_id: str):
-    """获取转换任务状态"""
-    return await document_converter.get_job_status(job_id)
-
-
-async def run_mcp_server():
-    """运行MCP服务器"""
-    # 使用stdio传输
-    from mcp.server.stdio import stdio_server
-    
-    async with stdio_server() as (read_stream, write_stream):
-        await mcp_server.run(
-            read_stream,
-            write_stream,
-            mcp_server.create_initialization_options()
-        )
+async def get_status(job_id: str, include_result: bool = False) -> Dict[str, Any]:
+    """获取转换任务状态，include_result=true 时附带转换结果"""
+    return await document_converter.get_job_status(job_id, include_result=include_result)
 
 
 def main():
@@ -301,10 +190,19 @@ def main():
     if len(sys.argv) > 1 and sys.argv[1] == "--api":
         # 运行FastAPI服务器
         import uvicorn
-        uvicorn.run(app, host="0.0.0.0", port=8000)
+        # 多进程模式下uvicorn需要通过导入字符串加载应用
+        uvicorn.run(
+            "main:app" if config.api_workers > 1 else app,
+            host=config.api_host,
+            port=config.api_port,
+            workers=config.api_workers,
+            timeout_keep_alive=config.api_keep_alive_timeout,
+            backlog=config.api_backlog,
+            ws="none"  # 未使用WebSocket
+        )
     else:
         # 运行MCP服务器
-        asyncio.run(run_mcp_server())
+        run_stdio(mcp_server)
 
 
 if __name__ == "__main__":
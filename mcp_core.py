@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+MCP Core Module
+
+Shared MCP tool definitions and handlers used by all server entry points.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type, TypeVar
+
+from cachetools import LRUCache
+from mcp.server import Server
+from mcp.types import (
+    CallToolResult,
+    TextContent,
+    Tool,
+)
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
+from config import config
+from document_converter import DocumentConverter
+from sse_manager import SSEManager
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(obj: Any) -> str:
+    """序列化为两格缩进的JSON文本"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+
+# 各入口共享的组件
+document_converter = DocumentConverter()
+sse_manager = SSEManager(
+    heartbeat_interval=config.sse_heartbeat_interval,
+    connection_timeout=config.sse_connection_timeout,
+    retry_ms=config.sse_retry_interval
+)
+
+# 任务状态输出缓存：任务ID -> (状态版本号, 结果内容)，轮询未变化的任务时直接复用
+_status_cache: LRUCache = LRUCache(maxsize=1024)
+
+# 支持格式的工具结果内容，进程内不变，首次使用时生成
+_FORMATS_CONTENT: Optional[List[TextContent]] = None
+
+# 工具列表在导入时构建一次，每次list_tools请求直接复用
+_TOOLS: List[Tool] = [
+    Tool(
+        name="convert_document",
+        description="Convert documents between different formats (PDF, DOCX, MD, TXT, HTML)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "source_format": {
+                    "type": "string",
+                    "description": "Source document format (pdf, docx, md, txt, html)"
+                },
+                "target_format": {
+                    "type": "string",
+                    "description": "Target document format (pdf, docx, md, txt, html)"
+                },
+                "content": {
+                    "type": "string",
+                    "description": "Document content (for text-based formats)"
+                },
+                "file_path": {
+                    "type": "string",
+                    "description": "Path to source file (alternative to content)"
+                }
+            },
+            "required": ["source_format", "target_format"],
+            "additionalProperties": False
+        }
+    ),
+    Tool(
+        name="list_supported_formats",
+        description="List all supported document formats for conversion",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "additionalProperties": False
+        }
+    ),
+    Tool(
+        name="get_conversion_status",
+        description="Get the status of a document conversion job",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "job_id": {
+                    "type": "string",
+                    "description": "Conversion job ID"
+                }
+            },
+            "required": ["job_id"],
+            "additionalProperties": False
+        }
+    )
+]
+
+
+class ConvertDocumentArgs(BaseModel):
+    """convert_document 工具参数"""
+    model_config = ConfigDict(extra="forbid")
+    
+    source_format: str = Field(min_length=1)
+    target_format: str = Field(min_length=1)
+    content: Optional[str] = None
+    file_path: Optional[str] = None
+
+
+class ListFormatsArgs(BaseModel):
+    """list_supported_formats 工具参数"""
+    model_config = ConfigDict(extra="forbid")
+
+
+class ConversionStatusArgs(BaseModel):
+    """get_conversion_status 工具参数"""
+    model_config = ConfigDict(extra="forbid")
+    
+    job_id: str = Field(min_length=1)
+
+
+_ArgsT = TypeVar("_ArgsT", bound=BaseModel)
+
+
+def _parse_args(model: Type[_ArgsT], arguments: Optional[Dict[str, Any]]) -> _ArgsT:
+    """校验工具参数，失败时抛出ValueError"""
+    try:
+        return model.model_validate(arguments or {})
+    except ValidationError as e:
+        # 错误信息只包含字段和原因，不回显参数内容
+        details = "; ".join(
+            f"{'.'.join(str(loc) for loc in err['loc']) or 'arguments'}: {err['msg']}"
+            for err in e.errors()
+        )
+        raise ValueError(f"Invalid arguments: {details}") from None
+
+
+async def handle_convert_document(arguments: Dict[str, Any]) -> List[TextContent]:
+    """处理文档转换"""
+    args = _parse_args(ConvertDocumentArgs, arguments)
+    
+    if not args.content and not args.file_path:
+        raise ValueError("Either content or file_path must be provided")
+    
+    # 创建转换任务
+    job_id = document_converter.allocate_job(
+        source_format=args.source_format,
+        target_format=args.target_format,
+        content=args.content,
+        file_path=args.file_path
+    )
+    
+    # 提交任务的同时通过SSE发送进度更新
+    await asyncio.gather(
+        document_converter.run_job(job_id),
+        sse_manager.send_event({
+            "type": "conversion_started",
+            "job_id": job_id,
+            "source_format": args.source_format,
+            "target_format": args.target_format
+        })
+    )
+    
+    return [TextContent(type="text", text=f"Document conversion started. Job ID: {job_id}")]
+
+
+async def handle_list_supported_formats(arguments: Dict[str, Any]) -> List[TextContent]:
+    """列出支持的格式"""
+    global _FORMATS_CONTENT
+    _parse_args(ListFormatsArgs, arguments)
+    if _FORMATS_CONTENT is None:
+        formats_info = {
+            "supported_formats": document_converter.get_supported_formats(),
+            "format_details": document_converter.supported_formats
+        }
+        _FORMATS_CONTENT = [TextContent(type="text", text=_dumps(formats_info))]
+    return _FORMATS_CONTENT
+
+
+async def handle_get_conversion_status(arguments: Dict[str, Any]) -> List[TextContent]:
+    """获取转换状态"""
+    args = _parse_args(ConversionStatusArgs, arguments)
+    
+    version = document_converter.get_job_version(args.job_id)
+    cached = _status_cache.get(args.job_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    status = await document_converter.get_job_status(args.job_id, include_result=True)
+    content = [TextContent(type="text", text=_dumps(status))]
+    if version is not None:
+        _status_cache[args.job_id] = (version, content)
+    return content
+
+
+# 工具名到处理函数的映射
+_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[List[TextContent]]]] = {
+    "convert_document": handle_convert_document,
+    "list_supported_formats": handle_list_supported_formats,
+    "get_conversion_status": handle_get_conversion_status,
+}
+
+
+async def dispatch_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+    """按名称执行工具，未知工具或参数错误时抛出异常"""
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        raise ValueError(f"Unknown tool: {name}")
+    return await handler(arguments)
+
+
+def _error_result(message: str, use_call_tool_result: bool):
+    """构建错误结果"""
+    content = [TextContent(type="text", text=f"Error: {message}")]
+    if use_call_tool_result:
+        return CallToolResult(content=content, isError=True)
+    return content
+
+
+# 参数缺失、未知工具等错误的提示是固定文本，结果构建一次后复用
+_cached_error_result = functools.lru_cache(maxsize=128)(_error_result)
+
+
+def build_server(use_call_tool_result: bool = True) -> Server:
+    """创建MCP服务器
+    
+    use_call_tool_result 为False时工具调用返回内容列表而不是CallToolResult对象，
+    用于规避部分MCP版本中CallToolResult的序列化问题
+    """
+    server = Server("document-conversion-server")
+    
+    @server.list_tools()
+    async def handle_list_tools() -> List[Tool]:
+        """列出可用的工具"""
+        return _TOOLS
+    
+    @server.call_tool()
+    async def handle_call_tool(name: str, arguments: Dict[str, Any]):
+        """处理工具调用"""
+        try:
+            content = await dispatch_tool(name, arguments)
+        except ValueError as e:
+            logger.error(f"Error handling tool call {name}: {e}")
+            return _cached_error_result(str(e), use_call_tool_result)
+        except Exception as e:
+            logger.error(f"Error handling tool call {name}: {e}")
+            return _error_result(str(e), use_call_tool_result)
+        
+        if use_call_tool_result:
+            return CallToolResult(content=content, isError=False)
+        return content
+    
+    return server
+
+
+def install_eager_task_factory():
+    """Python 3.12+ 为当前事件循环设置急切任务工厂，能同步完成的短任务不再等待下一轮调度
+    
+    只在服务启动时由入口显式调用，已设置其他任务工厂时不覆盖
+    """
+    if sys.version_info < (3, 12):
+        return
+    loop = asyncio.get_running_loop()
+    if loop.get_task_factory() is None:
+        loop.set_task_factory(asyncio.eager_task_factory)
+
+
+async def run_mcp_server(server: Server):
+    """通过stdio运行MCP服务器"""
+    from mcp.server.stdio import stdio_server
+    
+    install_eager_task_factory()
+    
+    async with stdio_server() as (read_stream, write_stream):
+        await server.run(
+            read_stream,
+            write_stream,
+            server.create_initialization_options()
+        )
+
+
+def run_stdio(server: Server):
+    """在新的事件循环中运行MCP服务器，已安装uvloop时使用uvloop"""
+    try:
+        from uvloop import run
+    except ImportError:  # 未安装uvloop时使用默认事件循环
+        from asyncio import run
+    run(run_mcp_server(server))
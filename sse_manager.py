@@ -6,79 +6,263 @@ Provides Server-Sent Events (SSE) management for real-time communication.
 """
 
 import asyncio
+import heapq
 import json
 import logging
+import os
 import time
-from dataclasses import dataclass, asdict
-from typing import Any, AsyncGenerator, Dict, List, Optional, Set
+import uuid
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 每个连接的事件队列上限
+DEFAULT_MAX_QUEUE_SIZE = 1024
+# 连续溢出超过该次数的慢客户端会被断开
+DEFAULT_MAX_LAG = 256
+# 断开慢客户端时建议浏览器重连的间隔（毫秒）
+EVICTION_RETRY_MS = 5000
+# 连接建立时告知浏览器的默认重连间隔（毫秒）
+DEFAULT_RETRY_MS = 30000
+# 合并连续事件帧时的最长等待时间（秒）、单次写出的字节上限和帧数上限
+DEFAULT_COALESCE_DELAY = 0.02
+COALESCE_MAX_BYTES = 64 * 1024
+COALESCE_MAX_FRAMES = 64
+# 空闲时发送的保持连接注释帧，以及空闲多久（秒）后发送
+_KEEPALIVE = b": keep-alive\n\n"
+KEEPALIVE_INTERVAL = 15
+# 过期连接清理间隔（秒）：基准值随连接数增长，并限制在上下限之间
+CLEANUP_BASE_INTERVAL = 60
+CLEANUP_MIN_INTERVAL = 10
+CLEANUP_MAX_INTERVAL = 300
+
 
-@dataclass
 class SSEEvent:
     """SSE事件数据类"""
-    event: str
-    data: Dict[str, Any]
-    id: Optional[str] = None
-    retry: Optional[int] = None
-    timestamp: Optional[str] = None
-    
-    def __post_init__(self):
-        if self.timestamp is None:
-            self.timestamp = datetime.now().isoformat()
+    __slots__ = ('event', 'data', 'id', 'retry', 'timestamp')
+    
+    def __init__(
+        self,
+        event: str,
+        data: Dict[str, Any],
+        id: Optional[str] = None,
+        retry: Optional[int] = None,
+        timestamp: Optional[str] = None
+    ):
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+        self.timestamp = timestamp if timestamp is not None else _now_iso()
+
+
+class _SSEEventPool:
+    """SSEEvent对象池，事件编码为字节帧后即可归还复用"""
+    __slots__ = ('_free', '_size')
+    
+    def __init__(self, size: int):
+        self._free: deque = deque()
+        self._size = size
+    
+    def acquire(
+        self,
+        event: str,
+        data: Dict[str, Any],
+        id: Optional[str] = None,
+        retry: Optional[int] = None
+    ) -> SSEEvent:
+        """取出一个事件对象并设置字段"""
+        if not self._free:
+            return SSEEvent(event=event, data=data, id=id, retry=retry)
+        sse_event = self._free.pop()
+        sse_event.event = event
+        sse_event.data = data
+        sse_event.id = id
+        sse_event.retry = retry
+        sse_event.timestamp = _now_iso()
+        return sse_event
+    
+    def release(self, sse_event: SSEEvent):
+        """归还事件对象，池已满时直接丢弃"""
+        if len(self._free) < self._size:
+            sse_event.data = None  # 不再持有事件数据
+            self._free.append(sse_event)
+
+
+# 时间戳缓存的有效期（秒）
+_TS_RESOLUTION = 0.01
+# 最近一次生成的ISO时间戳：[生成时间, 时间戳文本]
+_TS_CACHE: List[Any] = [0.0, ""]
+
+
+def _now_iso() -> str:
+    """当前时间的ISO格式文本，同一时间片内的多次调用复用同一结果"""
+    t = time.time()
+    cache = _TS_CACHE
+    if t - cache[0] >= _TS_RESOLUTION or t < cache[0]:
+        cache[0] = t
+        cache[1] = datetime.fromtimestamp(t).isoformat()
+    return cache[1]
+
+
+def _json_bytes(data: Any) -> bytes:
+    """将事件数据序列化为UTF-8编码的JSON"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class SSERingBuffer:
+    """固定容量的单生产者单消费者环形缓冲区，写满时覆盖最旧的元素"""
+    __slots__ = ('buf', 'mask', 'head', 'tail', 'waker')
+    
+    def __init__(self, capacity: int):
+        # 容量向上取整为2的幂，下标用位与计算
+        size = 1 << max(capacity - 1, 0).bit_length()
+        self.buf: List[Any] = [None] * size
+        self.mask = size - 1
+        self.head = 0
+        self.tail = 0
+        self.waker = asyncio.Event()  # 消费者在缓冲区为空时等待
+    
+    def __len__(self) -> int:
+        return self.tail - self.head
+    
+    def put(self, item: Any) -> bool:
+        """写入元素并唤醒消费者；缓冲区已满时覆盖最旧的元素并返回False"""
+        overwritten = self.tail - self.head > self.mask
+        if overwritten:
+            self.head += 1
+        self.buf[self.tail & self.mask] = item
+        self.tail += 1
+        if not self.waker.is_set():
+            self.waker.set()
+        return not overwritten
+    
+    def get_nowait(self) -> Any:
+        """取出最旧的元素，缓冲区为空时返回None"""
+        if self.head == self.tail:
+            return None
+        i = self.head & self.mask
+        item = self.buf[i]
+        self.buf[i] = None
+        self.head += 1
+        return item
+    
+    def clear(self):
+        """清空缓冲区"""
+        self.buf = [None] * (self.mask + 1)
+        self.head = self.tail = 0
 
 
 class SSEConnection:
     """SSE连接类"""
     
-    def __init__(self, connection_id: str):
+    def __init__(
+        self,
+        connection_id: str,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        max_lag: int = DEFAULT_MAX_LAG
+    ):
         self.connection_id = connection_id
-        self.queue: asyncio.Queue = asyncio.Queue()
+        self.buffer = SSERingBuffer(max_queue_size)
+        self.max_lag = max_lag
+        self.lag_count = 0  # 连续溢出次数
+        self.dropped = 0  # 因缓冲区满被覆盖的事件总数
+        self.evicted = False
         self.connected = True
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = time.monotonic()  # 单调时钟，仅用于超时计算
+        self.last_heartbeat_iso = _now_iso()  # 心跳时间的ISO文本，供连接信息直接读取
         self.created_at = datetime.now()
     
-    async def send_event(self, event: SSEEvent):
-        """发送事件到连接"""
-        if self.connected:
-            try:
-                await self.queue.put(event)
-            except Exception as e:
-                logger.error(f"Error sending event to connection {self.connection_id}: {e}")
-                self.connected = False
+    def send_event(self, frame: bytes) -> bool:
+        """发送已编码的事件帧到连接（同步写入），缓冲区满时覆盖最旧的事件
+        
+        返回连接是否仍然有效，连接已断开或因此被断开时返回False
+        """
+        if not self.connected:
+            return False
+        
+        if self.buffer.put(frame):
+            self.lag_count = 0
+            return True
+        
+        self.dropped += 1
+        self.lag_count += 1
+        if self.lag_count > self.max_lag:
+            logger.warning(f"Evicting slow SSE connection {self.connection_id}")
+            self.evict()
+            return False
+        return True
+    
+    def evict(self):
+        """断开慢客户端并唤醒等待中的事件流"""
+        self.evicted = True
+        self.connected = False
+        self.buffer.clear()
+        self.buffer.waker.set()
     
-    async def get_event(self) -> Optional[SSEEvent]:
+    async def get_event(self) -> Optional[bytes]:
         """获取事件（非阻塞）"""
-        try:
-            return self.queue.get_nowait()
-        except asyncio.QueueEmpty:
-            return None
+        return self.buffer.get_nowait()
     
-    async def wait_for_event(self, timeout: float = 30.0) -> Optional[SSEEvent]:
-        """等待事件（阻塞）"""
-        try:
-            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
-        except asyncio.TimeoutError:
-            return None
+    async def wait_for_event(self, timeout: float = 30.0) -> Optional[bytes]:
+        """等待事件（阻塞），超时或连接断开时返回None"""
+        frame = self.buffer.get_nowait()
+        if frame is None and self.connected:
+            waker = self.buffer.waker
+            waker.clear()
+            try:
+                await asyncio.wait_for(waker.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+            frame = self.buffer.get_nowait()
+        return frame
     
     def disconnect(self):
-        """断开连接"""
+        """断开连接并唤醒等待中的事件流"""
         self.connected = False
+        self.buffer.waker.set()
     
     def update_heartbeat(self):
         """更新心跳时间"""
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = time.monotonic()
+        self.last_heartbeat_iso = _now_iso()
 
 
 class SSEManager:
     """SSE管理器"""
     
-    def __init__(self, heartbeat_interval: int = 30, connection_timeout: int = 3600):
+    def __init__(
+        self,
+        heartbeat_interval: int = 30,
+        connection_timeout: int = 3600,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        max_lag: int = DEFAULT_MAX_LAG,
+        coalesce_delay: float = DEFAULT_COALESCE_DELAY,
+        retry_ms: int = DEFAULT_RETRY_MS
+    ):
         self.connections: Dict[str, SSEConnection] = {}
+        # 按连接ID哈希分片的连接快照，供广播遍历；连接建立或断开时只重建所在分片
+        self._shards: List[Tuple[SSEConnection, ...]] = [()] * (os.cpu_count() or 1)
+        # 过期检查堆：(心跳时间, 连接ID)，按心跳时间排序，过时条目在弹出时处理
+        self._expiry_heap: List[Tuple[float, str]] = []
         self.heartbeat_interval = heartbeat_interval
         self.connection_timeout = connection_timeout
+        self.max_queue_size = max_queue_size
+        self.max_lag = max_lag
+        self.coalesce_delay = coalesce_delay
+        self._retry_frame = f"retry: {retry_ms}\n\n".encode()
+        self._event_pool = _SSEEventPool((os.cpu_count() or 1) * 2)
+        # 心跳帧缓存：(整秒时间, 编码后的帧)，同一秒内的心跳复用同一帧
+        self._heartbeat_cache: Tuple[int, bytes] = (-1, b"")
         self._cleanup_task = None
         self._started = False
     
@@ -96,23 +280,32 @@ class SSEManager:
         """清理过期连接"""
         while True:
             try:
-                current_time = time.time()
-                expired_connections = []
-                
-                for conn_id, connection in self.connections.items():
-                    if (current_time - connection.last_heartbeat > self.connection_timeout or
-                        not connection.connected):
-                        expired_connections.append(conn_id)
+                deadline = time.monotonic() - self.connection_timeout
+                heap = self._expiry_heap
                 
-                for conn_id in expired_connections:
+                # 只检查堆顶中心跳时间早于截止时间的条目
+                while heap and heap[0][0] < deadline:
+                    _, conn_id = heapq.heappop(heap)
+                    connection = self.connections.get(conn_id)
+                    if connection is None:
+                        continue
+                    if connection.connected and connection.last_heartbeat >= deadline:
+                        # 心跳已更新，按最新心跳时间重新入堆
+                        heapq.heappush(heap, (connection.last_heartbeat, conn_id))
+                        continue
                     logger.info(f"Cleaning up expired connection: {conn_id}")
                     await self.disconnect(conn_id)
                 
-                await asyncio.sleep(60)  # 每分钟清理一次
+                await asyncio.sleep(self._cleanup_interval())
                 
             except Exception as e:
                 logger.error(f"Error in cleanup task: {e}")
-                await asyncio.sleep(60)
+                await asyncio.sleep(self._cleanup_interval())
+    
+    def _cleanup_interval(self) -> float:
+        """清理间隔：连接少时及时清理，连接多时拉长间隔批量处理"""
+        interval = CLEANUP_BASE_INTERVAL + len(self.connections) / 100
+        return max(CLEANUP_MIN_INTERVAL, min(CLEANUP_MAX_INTERVAL, interval))
     
     async def create_connection(self, connection_id: Optional[str] = None) -> str:
         """创建新的SSE连接"""
@@ -121,11 +314,15 @@ class SSEManager:
             self._start_cleanup_task()
         
         if connection_id is None:
-            import uuid
-            connection_id = str(uuid.uuid4())
+            connection_id = uuid.uuid4().hex
         
-        connection = SSEConnection(connection_id)
+        connection = SSEConnection(connection_id, self.max_queue_size, self.max_lag)
         self.connections[connection_id] = connection
+        shard = hash(connection_id) % len(self._shards)
+        # 同ID的旧连接已被字典中的新连接替换，分片中也一并移除
+        members = tuple(c for c in self._shards[shard] if c.connection_id != connection_id)
+        self._shards[shard] = members + (connection,)
+        heapq.heappush(self._expiry_heap, (connection.last_heartbeat, connection_id))
         
         logger.info(f"Created SSE connection: {connection_id}")
         
@@ -138,17 +335,36 @@ class SSEManager:
                 "message": "SSE connection established"
             }
         )
-        await connection.send_event(welcome_event)
+        connection.send_event(self._format_sse_event(welcome_event))
         
         return connection_id
     
     async def disconnect(self, connection_id: str):
         """断开连接"""
-        if connection_id in self.connections:
-            connection = self.connections[connection_id]
-            connection.disconnect()
-            del self.connections[connection_id]
-            logger.info(f"Disconnected SSE connection: {connection_id}")
+        self._remove_connection(connection_id)
+    
+    def _remove_connection(self, connection_id: str):
+        """断开连接并从连接表和广播分片中移除"""
+        connection = self.connections.pop(connection_id, None)
+        if connection is None:
+            return
+        connection.disconnect()
+        shard = hash(connection_id) % len(self._shards)
+        self._shards[shard] = tuple(c for c in self._shards[shard] if c is not connection)
+        logger.info(f"Disconnected SSE connection: {connection_id}")
+    
+    def _deliver(self, targets: List[Tuple[SSEConnection, ...]], frame: bytes):
+        """将事件帧写入各连接，已断开（如被驱逐）的连接立即移除，不再等待过期清理"""
+        stale = None
+        for shard in targets:
+            for connection in shard:
+                if not connection.send_event(frame):
+                    if stale is None:
+                        stale = []
+                    stale.append(connection.connection_id)
+        if stale:
+            for connection_id in stale:
+                self._remove_connection(connection_id)
     
     async def send_event(
         self,
@@ -158,35 +374,49 @@ class SSEManager:
         event_id: Optional[str] = None
     ):
         """发送事件到指定连接或所有连接"""
-        sse_event = SSEEvent(
-            event=event,
-            data=data,
-            id=event_id
-        )
+        # 先确定接收方，没有接收方时无需构造和编码事件
+        targets = self._resolve_targets(connection_id)
+        if not targets:
+            return
         
-        if connection_id:
-            # 发送到指定连接
-            if connection_id in self.connections:
-                await self.connections[connection_id].send_event(sse_event)
-            else:
-                logger.warning(f"Connection not found: {connection_id}")
-        else:
-            # 广播到所有连接
-            for connection in self.connections.values():
-                await connection.send_event(sse_event)
+        sse_event = self._event_pool.acquire(event, data, event_id)
+        try:
+            # 只编码一次，广播时所有连接共享同一个字节帧
+            frame = self._format_sse_event(sse_event)
+        finally:
+            self._event_pool.release(sse_event)
+        
+        # 写入环形缓冲区不会挂起，广播循环无需为每个连接创建协程
+        self._deliver(targets, frame)
     
     async def send_heartbeat(self, connection_id: Optional[str] = None):
         """发送心跳"""
-        heartbeat_data = {
-            "type": "heartbeat",
-            "timestamp": datetime.now().isoformat()
-        }
+        targets = self._resolve_targets(connection_id)
+        if not targets:
+            return
         
-        await self.send_event(
-            data=heartbeat_data,
-            event="heartbeat",
-            connection_id=connection_id
-        )
+        # 心跳内容只有时间戳会变化，按秒缓存编码后的帧
+        second = int(time.monotonic())
+        cached_second, frame = self._heartbeat_cache
+        if cached_second != second:
+            heartbeat_data = {
+                "type": "heartbeat",
+                "timestamp": _now_iso()
+            }
+            frame = b"event: heartbeat\ndata: " + _json_bytes(heartbeat_data) + b"\n\n"
+            self._heartbeat_cache = (second, frame)
+        
+        self._deliver(targets, frame)
+    
+    def _resolve_targets(self, connection_id: Optional[str]) -> List[Tuple[SSEConnection, ...]]:
+        """确定事件接收方（按分片分组）：指定连接或全部连接，没有接收方时返回空列表"""
+        if connection_id:
+            connection = self.connections.get(connection_id)
+            if connection is None:
+                logger.warning(f"Connection not found: {connection_id}")
+                return []
+            return [(connection,)]
+        return self._shards if self.connections else []
     
     async def send_conversion_progress(
         self,
@@ -201,7 +431,7 @@ class SSEManager:
             "job_id": job_id,
             "progress": progress,
             "status": status,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
         await self.send_event(
@@ -221,7 +451,7 @@ class SSEManager:
             "type": "conversion_complete",
             "job_id": job_id,
             "result": result,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
         await self.send_event(
@@ -241,7 +471,7 @@ class SSEManager:
             "type": "conversion_error",
             "job_id": job_id,
             "error": error,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
         await self.send_event(
@@ -262,13 +492,14 @@ class SSEManager:
                 "connection_id": conn_id,
                 "connected": connection.connected,
                 "created_at": connection.created_at.isoformat(),
-                "last_heartbeat": datetime.fromtimestamp(connection.last_heartbeat).isoformat(),
-                "queue_size": connection.queue.qsize()
+                "last_heartbeat": connection.last_heartbeat_iso,
+                "queue_size": len(connection.buffer),
+                "dropped": connection.dropped
             })
         return info
     
-    async def event_stream(self, connection_id: Optional[str] = None) -> AsyncGenerator[str, None]:
-        """生成SSE事件流"""
+    async def event_stream(self, connection_id: Optional[str] = None) -> AsyncGenerator[bytes, None]:
+        """生成SSE事件流（已编码的字节帧，可直接写入响应）"""
         if connection_id is None:
             connection_id = await self.create_connection()
         
@@ -277,52 +508,103 @@ class SSEManager:
             return
         
         try:
-            last_heartbeat = time.time()
+            # 设置浏览器断线后的重连间隔
+            yield self._retry_frame
+            
+            last_heartbeat = last_sent = time.monotonic()
+            # 心跳间隔下限，避免配置过小时频繁发送心跳
+            heartbeat_interval = max(5, self.heartbeat_interval)
             
             while connection.connected:
                 # 发送心跳
-                current_time = time.time()
-                if current_time - last_heartbeat >= self.heartbeat_interval:
+                current_time = time.monotonic()
+                if current_time - last_heartbeat >= heartbeat_interval:
                     await self.send_heartbeat(connection_id)
                     last_heartbeat = current_time
                 
-                # 获取事件
-                event = await connection.wait_for_event(timeout=5.0)
+                # 等待新事件，超时设为下一次心跳或保持连接的截止时间，有待发送事件时立即返回
+                deadline = min(last_heartbeat + heartbeat_interval, last_sent + KEEPALIVE_INTERVAL)
+                frame = await connection.wait_for_event(timeout=deadline - current_time)
                 
-                if event:
+                if frame:
                     connection.update_heartbeat()
-                    yield self._format_sse_event(event)
-                else:
-                    # 发送保持连接的注释
-                    yield ": keep-alive\n\n"
+                    yield await self._coalesce_frames(connection, frame)
+                    last_sent = time.monotonic()
+                elif connection.connected:
+                    current_time = time.monotonic()
+                    if (current_time - last_sent >= KEEPALIVE_INTERVAL and
+                            current_time - last_heartbeat < heartbeat_interval):
+                        # 发送保持连接的注释，心跳即将发送时省略
+                        yield _KEEPALIVE
+                        last_sent = current_time
+            
+            if connection.evicted:
+                # 慢客户端被断开，提示浏览器稍后自动重连
+                yield f"retry: {EVICTION_RETRY_MS}\n\n".encode()
                 
         except Exception as e:
             logger.error(f"Error in event stream for connection {connection_id}: {e}")
         finally:
             await self.disconnect(connection_id)
     
-    def _format_sse_event(self, event: SSEEvent) -> str:
-        """格式化SSE事件"""
+    async def _coalesce_frames(self, connection: SSEConnection, first: bytes) -> bytes:
+        """在短时间内合并后续到达的事件帧，减少写出次数"""
+        frames = [first]
+        size = len(first)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.coalesce_delay
+        
+        while size < COALESCE_MAX_BYTES and len(frames) < COALESCE_MAX_FRAMES:
+            # 先取走已在缓冲区中的帧
+            frame = connection.buffer.get_nowait()
+            if frame is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                frame = await connection.wait_for_event(timeout=remaining)
+            
+            if not frame:
+                # 等待超时，或连接已被断开
+                break
+            frames.append(frame)
+            size += len(frame)
+        
+        return b"".join(frames)
+    
+    def _format_sse_event(self, event: SSEEvent) -> bytes:
+        """格式化SSE事件为编码后的字节帧"""
+        data = _json_bytes(event.data)
+        
+        # 紧凑JSON中的换行都已转义，通常只有一行数据，直接拼接整帧
+        if b'\n' not in data:
+            header = ""
+            if event.id:
+                header += f"id: {event.id}\n"
+            if event.event:
+                header += f"event: {event.event}\n"
+            if event.retry:
+                header += f"retry: {event.retry}\n"
+            return b"".join((header.encode('utf-8'), b"data: ", data, b"\n\n"))
+        
         lines = []
         
         if event.id:
-            lines.append(f"id: {event.id}")
+            lines.append(f"id: {event.id}".encode('utf-8'))
         
         if event.event:
-            lines.append(f"event: {event.event}")
+            lines.append(f"event: {event.event}".encode('utf-8'))
         
         if event.retry:
-            lines.append(f"retry: {event.retry}")
+            lines.append(f"retry: {event.retry}".encode('utf-8'))
         
         # 数据可能包含多行
-        data_str = json.dumps(event.data, ensure_ascii=False)
-        for line in data_str.split('\n'):
-            lines.append(f"data: {line}")
+        for line in data.split(b'\n'):
+            lines.append(b"data: " + line)
         
-        lines.append("")  # 空行表示事件结束
-        lines.append("")  # 额外的空行
+        lines.append(b"")  # 空行表示事件结束
+        lines.append(b"")  # 额外的空行
         
-        return "\n".join(lines)
+        return b"\n".join(lines)
     
     async def shutdown(self):
         """关闭SSE管理器"""
@@ -332,6 +614,7 @@ class SSEManager:
         connection_ids = list(self.connections.keys())
         for conn_id in connection_ids:
             await self.disconnect(conn_id)
+        self._expiry_heap.clear()
         
         # 取消清理任务
         if self._cleanup_task and not self._cleanup_task.done():
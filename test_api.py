@@ -7,14 +7,22 @@ import asyncio
 import json
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any
 
+# 复用TCP连接的共享会话
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+
 
 def test_formats_api():
     """测试格式列表API"""
     print("\n=== 测试支持的格式列表 ===")
     try:
-        response = requests.get('http://localhost:8000/formats')
+        response = _SESSION.get('http://localhost:8000/formats')
         if response.status_code == 200:
             data = response.json()
             print(f"✅ 支持的格式: {data['formats']}")
@@ -27,6 +35,16 @@ def test_formats_api():
         return False
 
 
+def _post_conversion(test_case: Dict[str, Any]) -> requests.Response:
+    """发送单个转换请求"""
+    data = {
+        'source_format': test_case['source_format'],
+        'target_format': test_case['target_format'],
+        'content': test_case['content']
+    }
+    return _SESSION.post('http://localhost:8000/convert', data=data)
+
+
 def test_conversion_api():
     """测试文档转换API"""
     print("\n=== 测试文档转换功能 ===")
@@ -55,16 +73,14 @@ def test_conversion_api():
     
     success_count = 0
     
-    for test_case in test_cases:
+    # 并发发送所有转换请求，按用例顺序输出结果
+    with ThreadPoolExecutor(max_workers=len(test_cases)) as executor:
+        futures = [executor.submit(_post_conversion, test_case) for test_case in test_cases]
+    
+    for test_case, future in zip(test_cases, futures):
         print(f"\n--- {test_case['name']} ---")
         try:
-            data = {
-                'source_format': test_case['source_format'],
-                'target_format': test_case['target_format'],
-                'content': test_case['content']
-            }
-            
-            response = requests.post('http://localhost:8000/convert', data=data)
+            response = future.result()
             
             if response.status_code == 200:
                 result = response.json()
@@ -90,7 +106,7 @@ def test_server_health():
     """测试服务器健康状态"""
     print("\n=== 测试服务器健康状态 ===")
     try:
-        response = requests.get('http://localhost:8000/formats', timeout=5)
+        response = _SESSION.get('http://localhost:8000/formats', timeout=5)
         if response.status_code == 200:
             print("✅ 服务器运行正常")
             return True
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+测试SSE客户端的增量解析
+"""
+
+from client_example import SSEClient
+
+# 含注释、event/id字段、CRLF换行和多行data的事件流
+STREAM = (
+    b"retry: 30000\r\n\r\n"
+    b": keep-alive\r\n\r\n"
+    b"id: 1\r\nevent: message\r\ndata: {\"type\": \"connected\", \"message\": \"hi\"}\r\n\r\n"
+    b"event: progress\r\ndata: {\r\ndata: \"type\": \"conversion_progress\",\r\ndata:  \"progress\": 50\r\ndata: }\r\n\r\n"
+    b"data: {\"type\": \"heartbeat\", \"text\": \"\xe4\xb8\xad\xe6\x96\x87\"}\n\n"
+)
+
+EXPECTED = [
+    {"type": "connected", "message": "hi"},
+    {"type": "conversion_progress", "progress": 50},
+    {"type": "heartbeat", "text": "中文"},
+]
+
+
+def test_feed_whole_stream():
+    """一次性输入完整事件流"""
+    client = SSEClient()
+    assert client._feed(STREAM) == EXPECTED
+    assert not client._buf
+
+
+def test_feed_byte_by_byte():
+    """逐字节输入，CRLF和多字节字符跨越分块时仍能正确解析"""
+    client = SSEClient()
+    events = []
+    for i in range(len(STREAM)):
+        events.extend(client._feed(STREAM[i:i + 1]))
+    assert events == EXPECTED
+    assert not client._buf
+
+
+def test_incomplete_event_waits_for_terminator():
+    """未收到结束空行的事件保留在缓冲区中"""
+    client = SSEClient()
+    assert client._feed(b"data: {\"type\": \"heartbeat\"}\r\n") == []
+    assert client._feed(b"\r") == []
+    assert client._feed(b"\n") == [{"type": "heartbeat"}]
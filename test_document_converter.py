@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+测试文档转换器
+"""
+
+import asyncio
+import os
+
+import pytest
+
+import document_converter
+from document_converter import DocumentConverter, _Job, _JobCache
+
+# 含HTML特殊字符和空白的纯文本
+PLAIN_TEXT = "x &amp; y\nif a<b and c>d then\n\ttab & x\n  leading space"
+
+
+@pytest.fixture(params=["selectolax", "regex"])
+def converter(request, monkeypatch):
+    """分别使用DOM解析和正则实现的转换器"""
+    if request.param == "regex":
+        monkeypatch.setattr(document_converter, "LexborHTMLParser", None)
+    elif document_converter.LexborHTMLParser is None:
+        pytest.skip("selectolax is not installed")
+    instance = DocumentConverter()
+    yield instance
+    instance.close()
+
+
+def _convert(converter: DocumentConverter, **kwargs) -> dict:
+    """提交转换任务并等待结果"""
+    async def run():
+        job_id = await converter.convert_async(**kwargs)
+        return await converter.wait_for_completion(job_id, timeout=30)
+
+    result = asyncio.run(run())
+    assert result["success"], result
+    return result
+
+
+def test_txt_to_md_keeps_text_literal(converter):
+    """纯文本中的实体、尖括号和空白原样保留"""
+    result = _convert(converter, source_format="txt", target_format="md", content=PLAIN_TEXT)
+    assert result["content"] == PLAIN_TEXT
+
+
+def test_txt_to_html_escapes_markup(converter):
+    """纯文本转HTML时转义特殊字符"""
+    result = _convert(converter, source_format="txt", target_format="html", content=PLAIN_TEXT)
+    assert result["content"] == (
+        "x &amp;amp; y<br>\n"
+        "if a&lt;b and c&gt;d then<br>\n"
+        "\ttab &amp; x<br>\n"
+        "  leading space"
+    )
+
+
+@pytest.mark.parametrize("binary_format", ["docx", "pdf"])
+def test_txt_round_trip_via_binary(converter, binary_format):
+    """纯文本经PDF/DOCX转换后再读回，文本内容不被当作标记"""
+    created = _convert(converter, source_format="txt", target_format=binary_format, content=PLAIN_TEXT)
+    try:
+        result = _convert(
+            converter,
+            source_format=binary_format,
+            target_format="txt",
+            file_path=created["file_path"]
+        )
+    finally:
+        os.unlink(created["file_path"])
+
+    if binary_format == "docx":
+        assert result["content"] == PLAIN_TEXT
+    else:
+        # PDF排版会合并空白，只检查字符
+        assert result["content"].split() == PLAIN_TEXT.split()
+
+
+def _job_with_file(tmp_path, name: str) -> _Job:
+    """创建结果指向临时文件的任务"""
+    path = tmp_path / name
+    path.write_bytes(b"result")
+    return _Job(result={"success": True, "file_path": str(path)})
+
+
+def test_job_cache_expiry_removes_result_files(tmp_path):
+    """任务过期时删除其结果文件"""
+    now = [0.0]
+    jobs = _JobCache(maxsize=10, ttl=5, timer=lambda: now[0])
+    jobs["old"] = _job_with_file(tmp_path, "old.pdf")
+    now[0] = 3.0
+    jobs["new"] = _job_with_file(tmp_path, "new.pdf")
+
+    now[0] = 6.0
+    jobs.expire()
+
+    assert "old" not in jobs
+    assert not (tmp_path / "old.pdf").exists()
+    assert (tmp_path / "new.pdf").exists()
+
+
+def test_job_cache_size_eviction_removes_result_files(tmp_path):
+    """超出容量被淘汰的任务删除其结果文件"""
+    jobs = _JobCache(maxsize=2, ttl=60)
+    for name in ("a", "b", "c"):
+        jobs[name] = _job_with_file(tmp_path, f"{name}.docx")
+
+    assert list(jobs) == ["b", "c"]
+    assert not (tmp_path / "a.docx").exists()
+    assert (tmp_path / "b.docx").exists()
+    assert (tmp_path / "c.docx").exists()
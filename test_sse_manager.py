@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试SSE管理器
+"""
+
+import asyncio
+
+from sse_manager import EVICTION_RETRY_MS, SSEManager, SSERingBuffer
+
+
+async def _read_stream(stream, frames: list):
+    """持续读取事件流"""
+    async for frame in stream:
+        frames.append(frame)
+
+
+def test_shutdown_ends_open_stream_immediately():
+    """关闭管理器时正在等待事件的事件流立即结束"""
+    async def run():
+        manager = SSEManager()
+        frames: list = []
+        reader = asyncio.create_task(_read_stream(manager.event_stream(), frames))
+        await asyncio.sleep(0.1)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await manager.shutdown()
+        await asyncio.wait_for(reader, timeout=1)
+        return loop.time() - started, frames
+
+    elapsed, frames = asyncio.run(run())
+    assert elapsed < 0.5
+    assert frames[0].startswith(b"retry: ")
+
+
+def test_evicted_connection_leaves_broadcast_set():
+    """被驱逐的慢连接立即从连接表和广播分片中移除"""
+    async def run():
+        manager = SSEManager(max_queue_size=2, max_lag=1)
+        slow_id = await manager.create_connection()
+        fast_id = await manager.create_connection()
+        fast = manager.connections[fast_id]
+        for i in range(4):
+            await manager.send_event({"n": i})
+            fast.buffer.get_nowait()
+            fast.buffer.get_nowait()
+        in_shards = any(c.connection_id == slow_id for shard in manager._shards for c in shard)
+        state = (in_shards, slow_id in manager.connections, fast.connected)
+        await manager.shutdown()
+        return state
+
+    in_shards, registered, fast_connected = asyncio.run(run())
+    assert not in_shards
+    assert not registered
+    assert fast_connected
+
+
+def test_ring_buffer_wraparound_keeps_fifo_order():
+    """读写下标多次越过容量后仍按先进先出顺序取出"""
+    buffer = SSERingBuffer(4)
+    received = []
+    for i in range(0, 30, 3):
+        for n in range(i, i + 3):
+            assert buffer.put(n)
+        received.extend(buffer.get_nowait() for _ in range(3))
+        assert len(buffer) == 0
+    assert received == list(range(30))
+    assert buffer.get_nowait() is None
+
+
+def test_ring_buffer_overflow_overwrites_oldest():
+    """容量向上取整为2的幂，写满后覆盖最旧的元素并返回False"""
+    buffer = SSERingBuffer(3)
+    results = [buffer.put(n) for n in range(6)]
+    assert results == [True] * 4 + [False] * 2
+    assert len(buffer) == 4
+    assert [buffer.get_nowait() for _ in range(4)] == [2, 3, 4, 5]
+    assert buffer.get_nowait() is None
+
+
+def test_overflow_evicts_slow_stream_with_retry_hint():
+    """持续溢出的慢连接被驱逐，事件流以重连提示结束"""
+    async def run():
+        manager = SSEManager(max_queue_size=4, max_lag=3)
+        connection_id = await manager.create_connection()
+        connection = manager.connections[connection_id]
+        stream = manager.event_stream(connection_id)
+        first = await stream.__anext__()
+        for i in range(4 + 4):
+            await manager.send_event({"n": i})
+        rest = [frame async for frame in stream]
+        await manager.shutdown()
+        return first, rest, connection
+
+    first, rest, connection = asyncio.run(run())
+    assert first.startswith(b"retry: ")
+    assert rest == [f"retry: {EVICTION_RETRY_MS}\n\n".encode()]
+    assert connection.evicted
+    assert connection.dropped == 4